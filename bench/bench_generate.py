@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Per-image render time of generate_images.py: PIL loops vs NumPy arrays
+
+Times the 800x1000 product canvas and the 1920x1080 hero canvas with
+USE_NUMPY off and on, and checks that both paths produce the same pixels.
+The last column is the steady state of a batch run, where the per-brand
+base canvas is already cached.
+
+    python3 bench/bench_generate.py --repeat 10
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import generate_images  # noqa: E402
+
+
+def time_render(render, repeat, cached=False):
+    """Milliseconds per render; uncached runs rebuild the base canvases each time"""
+    render()  # warm up fonts
+    elapsed = 0
+    for _ in range(repeat):
+        if not cached:
+            generate_images.clear_render_caches()
+        started = time.perf_counter()
+        image = render()
+        elapsed += time.perf_counter() - started
+    return elapsed / repeat * 1000, image
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    if generate_images.np is None:
+        sys.exit("NumPy is not installed - nothing to compare")
+
+    with open(os.path.join(ROOT, 'content.json'), 'r', encoding='utf-8') as f:
+        product = json.load(f)['products'][0]
+
+    canvases = {
+        'product 800x1000': lambda: generate_images.create_product_image(product),
+        'hero 1920x1080': generate_images.create_hero_background,
+    }
+
+    print(f"🎨 Render time per image ({args.repeat} runs)")
+    for name, render in canvases.items():
+        generate_images.USE_NUMPY = False
+        loop_ms, loop_image = time_render(render, args.repeat)
+        generate_images.USE_NUMPY = True
+        numpy_ms, numpy_image = time_render(render, args.repeat)
+        cached_ms, _ = time_render(render, args.repeat, cached=True)
+        identical = loop_image.tobytes() == numpy_image.tobytes()
+        print(f"  {name:<18} PIL loops {loop_ms:7.1f}ms   NumPy {numpy_ms:7.1f}ms   "
+              f"{loop_ms / numpy_ms:4.1f}x   cached {cached_ms:6.1f}ms   "
+              f"identical: {'yes' if identical else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Query time of server.py's SearchIndex on a synthetic catalogue
+
+Builds the index over a catalogue cloned from content.json (10k products
+by default, as bench/suite.py does) and times uncached lookups, from
+specific words to prefixes that match most of the catalogue. Exits with
+status 1 if the median of a query matching at most --broad-share of the
+catalogue goes over --target-ms. Broader queries are timed too, but their
+cost is ranking thousands of results, and the clones make every word of
+the catalogue match at least 1/13th of it.
+
+    python3 bench/bench_search.py --size 10000 --repeat 200
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import server  # noqa: E402
+from suite import synthetic_catalogue  # noqa: E402
+
+QUERIES = ('alligator', 'ghost piece', 'stone island cupro', 'c.p.', 'nylon sh', 'camo', 'st', 'stone', 'x', '4321')
+
+
+def time_query(index, query, repeat):
+    """(median ms, p99 ms, results) of ranking a query, bypassing the result cache"""
+    terms = tuple(dict.fromkeys(server.search_words(query)))[:server.MAX_SEARCH_TERMS]
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        ranked = index.rank(terms)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.99))], len(ranked)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--target-ms', type=float, default=1.0)
+    parser.add_argument('--broad-share', type=float, default=0.1,
+                        help="queries matching more of the catalogue than this aren't held to the target")
+    args = parser.parse_args()
+
+    products = synthetic_catalogue(args.size)['products']
+    started = time.perf_counter()
+    index = server.SearchIndex(products)
+    print(f"🔎 {args.size} products, {len(index.words)} words, "
+          f"index built in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    slow = 0
+    for query in QUERIES:
+        median, p99, results = time_query(index, query, args.repeat)
+        if results > args.broad_share * args.size:
+            mark = '➖'
+        elif median < args.target_ms:
+            mark = '✅'
+        else:
+            mark = '❌'
+            slow += 1
+        print(f"  {mark} {query!r:<22} {results:6d} results   "
+              f"median {median * 1000:7.0f}us   p99 {p99 * 1000:7.0f}us")
+    if slow:
+        sys.exit(f"\n❌ {slow} queries over {args.target_ms:g}ms")
+    print(f"\n✨ Every query matching up to {args.broad_share:.0%} of the catalogue under {args.target_ms:g}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Bytes on the wire per page for each Accept-Encoding
+
+Fetches index.html, shop.html and product.html plus the same-origin
+stylesheets and scripts they load and the content.json that main.js
+fetches, and sums the response bodies as sent by server.py.
+
+    python3 bench/bytes_on_wire.py
+"""
+
+import http.client
+import os
+import re
+
+from load_test import ROOT, free_port, start_server
+
+PAGES = ('index.html', 'shop.html', 'product.html')
+ENCODINGS = ('identity', 'gzip', 'br')
+ASSET_PATTERN = re.compile(r'<(?:link[^>]+rel="stylesheet"[^>]+href|script[^>]+src)="([^":]+)"')
+
+
+def page_resources(page):
+    with open(os.path.join(ROOT, page), encoding='utf-8') as f:
+        html = f.read()
+    return ['/' + page] + ['/' + src.lstrip('/') for src in ASSET_PATTERN.findall(html)] + ['/content.json']
+
+
+def fetch_size(port, path, encoding):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        conn.request('GET', path, headers={'Accept-Encoding': encoding})
+        response = conn.getresponse()
+        body = response.read()
+        return len(body), response.getheader('Content-Encoding') or 'identity'
+    finally:
+        conn.close()
+
+
+def measure(port):
+    """Return {page: {encoding: bytes}}"""
+    results = {}
+    for page in PAGES:
+        results[page] = {}
+        for encoding in ENCODINGS:
+            total = 0
+            for path in page_resources(page):
+                size, _ = fetch_size(port, path, encoding)
+                total += size
+            results[page][encoding] = total
+    return results
+
+
+def main():
+    port = free_port()
+    process = start_server('threaded', port)
+    try:
+        results = measure(port)
+    finally:
+        process.terminate()
+        process.wait()
+
+    print("📦 Bytes on the wire per page (HTML + CSS + JS + content.json)")
+    print(f"  {'page':<14}" + ''.join(f"{encoding:>12}" for encoding in ENCODINGS))
+    for page, sizes in results.items():
+        identity = sizes['identity']
+        cells = ''.join(f"{sizes[e] / 1024:>9.1f}KB " if e == 'identity'
+                        else f"{sizes[e] / 1024:>6.1f}KB {sizes[e] / identity:>3.0%}"
+                        for e in ENCODINGS)
+        print(f"  {page:<14}{cells}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Compare two bench/suite.py result files and flag regressions
+
+Exits with status 1 when any timing or throughput got worse by more
+than --threshold percent, so it can gate a CI job.
+
+    python3 bench/compare.py bench/results/before.json bench/results/after.json
+"""
+
+import argparse
+import json
+import sys
+
+HIGHER_IS_BETTER = ('req_per_sec', 'mb_per_sec')
+LOWER_IS_BETTER = ('p50_ms', 'p99_ms', 'seconds', 'cpu_seconds', 'per_image_ms', 'per_product_ms')
+
+
+def flatten(results, prefix=''):
+    """{'serving.html.p50_ms': 1.2, ...} for every compared metric"""
+    metrics = {}
+    for key, value in results.items():
+        if key == 'meta':
+            continue
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            metrics.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and key in HIGHER_IS_BETTER + LOWER_IS_BETTER:
+            metrics[name] = value
+    return metrics
+
+
+def change(name, before, after):
+    """Percent change, positive meaning better"""
+    if not before:
+        return 0.0
+    delta = (after - before) / before * 100
+    return delta if name.rsplit('.', 1)[-1] in HIGHER_IS_BETTER else -delta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help="percent worse that counts as a regression (default: 10)")
+    args = parser.parse_args()
+
+    with open(args.before, 'r', encoding='utf-8') as f:
+        before_results = json.load(f)
+    with open(args.after, 'r', encoding='utf-8') as f:
+        after_results = json.load(f)
+    before, after = flatten(before_results), flatten(after_results)
+
+    print(f"📊 {before_results['meta'].get('revision')} → {after_results['meta'].get('revision')}")
+    regressions = 0
+    for name in sorted(before.keys() & after.keys()):
+        improvement = change(name, before[name], after[name])
+        if improvement < -args.threshold:
+            mark = '❌'
+            regressions += 1
+        elif improvement > args.threshold:
+            mark = '✅'
+        else:
+            mark = '  '
+        print(f"  {mark} {name:<48} {before[name]:>12.2f} → {after[name]:>12.2f}  {improvement:+6.1f}%")
+
+    for name in sorted(before.keys() ^ after.keys()):
+        print(f"  ⚠️  {name} only in {'before' if name in before else 'after'}")
+
+    if regressions:
+        print(f"\n❌ {regressions} regression(s) beyond {args.threshold:g}%")
+        sys.exit(1)
+    print(f"\n✨ No regressions beyond {args.threshold:g}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Load test server.py against the /assets tree in each serving mode
+
+Starts server.py as a subprocess per mode, keeps a few slow clients
+trickling hero-bg.jpg (like a 2G phone would), and measures how many
+asset requests the remaining clients complete.
+
+    python3 bench/load_test.py --clients 16 --slow-clients 2 --duration 10
+"""
+
+import argparse
+import glob
+import http.client
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def asset_urls():
+    """All image URLs under public/assets, as the site references them"""
+    paths = glob.glob(os.path.join(ROOT, 'public', 'assets', '*', '*.jpg'))
+    return ['/' + os.path.relpath(path, os.path.join(ROOT, 'public')) for path in sorted(paths)]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, port, extra_args=()):
+    env = dict(os.environ, BARBOSS_ROOT=ROOT, PYTHONUNBUFFERED='1')
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'server.py'), '--mode', mode, '--port', str(port), *extra_args],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"server.py --mode {mode} did not start")
+
+
+def slow_client(port, stop):
+    """Download hero-bg.jpg 1 KB every 50 ms, holding the connection open"""
+    while not stop.is_set():
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            conn.request('GET', '/assets/img/hero-bg.jpg')
+            response = conn.getresponse()
+            while not stop.is_set() and response.read(1024):
+                time.sleep(0.05)
+            conn.close()
+        except (OSError, http.client.HTTPException):
+            time.sleep(0.05)
+
+
+def fast_client(port, urls, stop, results, headers=None):
+    conn = None
+    requests = 0
+    received = 0
+    latencies = []
+    while not stop.is_set():
+        try:
+            if conn is None:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            started = time.perf_counter()
+            conn.request('GET', random.choice(urls), headers=headers or {})
+            response = conn.getresponse()
+            body = response.read()
+            latencies.append(time.perf_counter() - started)
+            requests += 1
+            received += len(body)
+            if response.will_close:
+                conn.close()
+                conn = None
+        except (OSError, http.client.HTTPException):
+            if conn is not None:
+                conn.close()
+            conn = None
+    if conn is not None:
+        conn.close()
+    results.append((requests, received, latencies))
+
+
+def run_mode(mode, clients, slow_clients, duration, extra_args=(), urls=None, headers=None):
+    port = free_port()
+    process = start_server(mode, port, extra_args)
+    urls = urls or asset_urls()
+    stop = threading.Event()
+    results = []
+    threads = [threading.Thread(target=slow_client, args=(port, stop), daemon=True)
+               for _ in range(slow_clients)]
+    threads += [threading.Thread(target=fast_client, args=(port, urls, stop, results, headers), daemon=True)
+                for _ in range(clients)]
+    try:
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads[slow_clients:]:
+            thread.join(timeout=35)
+    finally:
+        process.terminate()
+        process.wait()
+
+    requests = sum(r[0] for r in results)
+    received = sum(r[1] for r in results)
+    latencies = sorted(l for r in results for l in r[2])
+    return {
+        'mode': mode,
+        'requests': requests,
+        'bytes': received,
+        'req_per_sec': requests / duration,
+        'mb_per_sec': received / duration / 1024 / 1024,
+        'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else None,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000 if latencies else None,
+    }
+
+
+def format_ms(value):
+    return f"{value:.1f}ms" if value is not None else "n/a"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--slow-clients', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--modes', nargs='+', default=['single', 'threaded'])
+    args = parser.parse_args()
+
+    print(f"🏋️  {args.clients} clients + {args.slow_clients} slow clients, {args.duration:.0f}s per mode")
+    baseline = None
+    for mode in args.modes:
+        result = run_mode(mode, args.clients, args.slow_clients, args.duration)
+        gain = f" ({result['req_per_sec'] / baseline:.1f}x)" if baseline else ""
+        baseline = baseline or result['req_per_sec'] or None
+        print(f"  {mode:>9}: {result['req_per_sec']:8.1f} req/s{gain}  "
+              f"{result['mb_per_sec']:6.1f} MB/s  "
+              f"p50 {format_ms(result['p50_ms'])}  p99 {format_ms(result['p99_ms'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Server CPU per GB of large images served: Python copy vs sendfile()
+
+Starts server.py with --no-sendfile and then with sendfile(), downloads
+the largest images over keep-alive connections until the target volume
+is reached, and reads the server's user + system CPU time from
+os.wait4() once it exits. The CPU of an idle start/stop is subtracted.
+
+    python3 bench/sendfile_cpu.py --gigabytes 1 --clients 4
+"""
+
+import argparse
+import http.client
+import os
+import signal
+import threading
+import time
+
+from load_test import free_port, start_server
+
+URLS = ('/assets/img/category-sweatshirts.jpg', '/assets/lookbook/look-real-01.jpg')
+
+
+def server_cpu(process):
+    """Stop the server and return its user + system CPU seconds"""
+    process.send_signal(signal.SIGINT)
+    _, _, usage = os.wait4(process.pid, 0)
+    process.returncode = 0
+    return usage.ru_utime + usage.ru_stime
+
+
+def download(port, target, counter, lock):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    index = 0
+    try:
+        while True:
+            with lock:
+                if counter[0] >= target:
+                    return
+            conn.request('GET', URLS[index % len(URLS)])
+            body = conn.getresponse().read()
+            index += 1
+            with lock:
+                counter[0] += len(body)
+    finally:
+        conn.close()
+
+
+def run(extra_args, target, clients):
+    """(CPU seconds, bytes served, wall seconds) for one server run"""
+    port = free_port()
+    process = start_server('threaded', port, extra_args)
+    counter = [0]
+    lock = threading.Lock()
+    threads = [threading.Thread(target=download, args=(port, target, counter, lock))
+               for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return server_cpu(process), counter[0], elapsed
+
+
+def idle_cpu(extra_args):
+    process = start_server('threaded', free_port(), extra_args)
+    return server_cpu(process)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--gigabytes', type=float, default=1.0)
+    parser.add_argument('--clients', type=int, default=4)
+    args = parser.parse_args()
+    target = int(args.gigabytes * 1024 ** 3)
+
+    print(f"💽 Serving {args.gigabytes:g}GB of large images to {args.clients} clients")
+    baseline = None
+    for name, extra_args in (('python copy', ['--no-sendfile']), ('sendfile', [])):
+        idle = idle_cpu(extra_args)
+        cpu, served, elapsed = run(extra_args, target, args.clients)
+        per_gb = (cpu - idle) / (served / 1024 ** 3)
+        gain = f" ({baseline / per_gb:.1f}x less)" if baseline else ""
+        baseline = baseline or per_gb
+        print(f"  {name:>12}: {per_gb:6.2f} CPU s/GB{gain}  "
+              f"{served / elapsed / 1024 ** 2:7.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
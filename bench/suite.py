@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""Benchmark suite: serving and image pipelines, results saved as JSON
+
+Serving: load-tests server.py (threaded) against the real tree at fixed
+concurrency, separately for the HTML pages, content.json and the images,
+and records req/s, p50/p99 latency and bytes.
+
+Pipelines: builds synthetic catalogues (100, 1k and 10k products cloned
+from content.json) in a scratch directory and times generate_images.py,
+optimize_images.py, update_catalog.py (a price update for every
+product), compile_catalog.py and render_pages.py on each, both from
+scratch and as a no-change rerun.
+Catalogues bigger than --max-images skip the two image pipelines.
+
+Results go to bench/results/<timestamp>.json; compare two runs with
+bench/compare.py.
+
+    python3 bench/suite.py --duration 5 --clients 16 --sizes 100 1000 10000
+"""
+
+import argparse
+import copy
+import csv
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from load_test import ROOT, asset_urls, run_mode
+
+RESULTS_DIR = os.path.join(ROOT, 'bench', 'results')
+HTML_URLS = ['/index.html', '/shop.html', '/product.html', '/about.html', '/contacts.html']
+BROWSER_HEADERS = {'Accept-Encoding': 'gzip, br', 'Accept': 'image/avif,image/webp,*/*'}
+TEMPLATES = ('index.html', 'shop.html', 'product.html')
+
+# Images generate_images.py draws besides one per product
+# (4 categories, 6 lookbook images, the hero)
+EXTRA_GENERATED_IMAGES = 11
+
+
+def bench_serving(clients, duration):
+    url_sets = {
+        'html': HTML_URLS,
+        'content.json': ['/content.json'],
+        'images': asset_urls(),
+    }
+    results = {}
+    for name, urls in url_sets.items():
+        result = run_mode('threaded', clients, 0, duration, urls=urls, headers=BROWSER_HEADERS)
+        results[name] = {key: result[key] for key in ('requests', 'bytes', 'req_per_sec', 'mb_per_sec', 'p50_ms', 'p99_ms')}
+        print(f"  {name:>13}: {result['req_per_sec']:8.1f} req/s  {result['mb_per_sec']:6.1f} MB/s  "
+              f"p50 {result['p50_ms']:.1f}ms  p99 {result['p99_ms']:.1f}ms")
+    return results
+
+
+def synthetic_catalogue(size):
+    """content.json with its products cloned up to `size`, each with a unique id"""
+    with open(os.path.join(ROOT, 'content.json'), 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    originals = data['products']
+    products = []
+    for i in range(size):
+        product = copy.deepcopy(originals[i % len(originals)])
+        if i >= len(originals):
+            product['id'] = f"{product['id']}-{i:05d}"
+            product['name'] = f"{product['name']} #{i}"
+            product['price'] = product.get('price', 0) + i % 1000
+            product.pop('gallery', None)
+        products.append(product)
+    data['products'] = products
+    return data
+
+
+def price_patch(workspace):
+    """CSV raising every product's price, as a supplier update would"""
+    with open(os.path.join(workspace, 'content.json'), 'r', encoding='utf-8') as f:
+        products = json.load(f)['products']
+    path = os.path.join(workspace, 'prices.csv')
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'price'])
+        writer.writerows((product['id'], product.get('price', 0) + 100) for product in products)
+    return path
+
+
+def run_script(workspace, script, *args):
+    """Wall and CPU seconds of one pipeline script run in the workspace"""
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(ROOT, script), *args], cwd=workspace, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    seconds = time.perf_counter() - started
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return {'seconds': seconds, 'cpu_seconds': cpu}
+
+
+def timed(workspace, script, *args, per=None, unit='image'):
+    result = run_script(workspace, script, *args)
+    if per:
+        result[f'{unit}s'] = per
+        result[f'per_{unit}_ms'] = result['seconds'] / per * 1000
+    return result
+
+
+def bench_pipelines(size, max_images, jobs):
+    workspace = tempfile.mkdtemp(prefix='barboss-bench-')
+    try:
+        for subdir in ('products', 'img', 'lookbook'):
+            os.makedirs(os.path.join(workspace, 'public', 'assets', subdir))
+        for name in TEMPLATES:
+            shutil.copy(os.path.join(ROOT, name), workspace)
+        with open(os.path.join(workspace, 'content.json'), 'w', encoding='utf-8') as f:
+            json.dump(synthetic_catalogue(size), f, ensure_ascii=False, indent=2)
+
+        results = {}
+        if size <= max_images:
+            images = size + EXTRA_GENERATED_IMAGES
+            jobs_args = ('--jobs', str(jobs))
+            results['generate_images'] = timed(workspace, 'generate_images.py', *jobs_args, per=images)
+            results['generate_images_noop'] = timed(workspace, 'generate_images.py', *jobs_args)
+            results['optimize_images'] = timed(workspace, 'optimize_images.py', '--init', *jobs_args, per=images)
+            results['optimize_images_noop'] = timed(workspace, 'optimize_images.py', *jobs_args)
+            results['hash_assets'] = timed(workspace, 'hash_assets.py', per=images)
+            results['hash_assets_noop'] = timed(workspace, 'hash_assets.py')
+        results['update_catalog'] = timed(workspace, 'update_catalog.py', price_patch(workspace),
+                                          per=size, unit='product')
+        results['compile_catalog'] = timed(workspace, 'compile_catalog.py', per=size, unit='product')
+        results['render_pages'] = timed(workspace, 'render_pages.py', per=size, unit='product')
+        results['render_pages_noop'] = timed(workspace, 'render_pages.py')
+        return results
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5, help="seconds per serving load test")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                        help="synthetic catalogue sizes")
+    parser.add_argument('--max-images', type=int, default=1000,
+                        help="largest catalogue to run the image pipelines on")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--skip-serving', action='store_true')
+    parser.add_argument('--skip-pipelines', action='store_true')
+    parser.add_argument('--output', help="results file (default: bench/results/<timestamp>.json)")
+    args = parser.parse_args()
+
+    started = datetime.datetime.now(datetime.timezone.utc)
+    results = {
+        'meta': {
+            'started': started.isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'args': vars(args),
+        },
+    }
+
+    if not args.skip_serving:
+        print(f"🏋️  Serving: {args.clients} clients, {args.duration:g}s per URL set")
+        results['serving'] = bench_serving(args.clients, args.duration)
+
+    if not args.skip_pipelines:
+        results['pipelines'] = {}
+        for size in args.sizes:
+            print(f"🏭 Pipelines: {size} products")
+            results['pipelines'][str(size)] = steps = bench_pipelines(size, args.max_images, args.jobs)
+            for step, result in steps.items():
+                per = next((f"  {value:7.1f}ms/{key[4:-3]}" for key, value in result.items()
+                            if key.startswith('per_')), '')
+                print(f"  {step:>21}: {result['seconds']:7.2f}s{per}")
+
+    output = args.output or os.path.join(RESULTS_DIR, started.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n📝 Results written to {os.path.relpath(output)}")
+
+
+if __name__ == "__main__":
+    main()
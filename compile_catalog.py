@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""Compile content.json into a columnar binary catalogue for server.py
+
+content.json stays the file people edit. This writes content.bin next to
+it: interned strings plus fixed-width columns for the product fields the
+catalogue API filters and sorts on, with the sort orders precomputed.
+server.py memory-maps it instead of parsing content.json, so startup is
+a few stat() calls and pages of the file are only read as they are used.
+
+Layout: MAGIC, a little-endian uint32 header length and a JSON header
+giving each section's offset (from the 8-byte aligned end of the header),
+length and array typecode. Arrays are native-endian; the header records
+the byte order. Product fields without a column (description, gallery,
+imgMeta, ...) are kept per product as compact JSON, as is everything in
+content.json outside "products".
+
+content.bin remembers the size and mtime of the content.json it was built
+from and server.py ignores it once they differ, so re-run this after
+every edit:
+
+    python3 compile_catalog.py
+"""
+
+import argparse
+import array
+import json
+import mmap
+import os
+import struct
+import sys
+from collections.abc import Mapping
+
+CONTENT_PATH = 'content.json'
+COMPILED_PATH = 'content.bin'
+
+MAGIC = b'BBCAT\0\0\0'
+FORMAT_VERSION = 2
+ALIGNMENT = 8
+PREAMBLE = struct.Struct('<I')
+
+# Columns. String fields hold codes into the string table (NONE when the
+# product lacks the field). img is split into an interned directory and a
+# file name. flags packs FLAG_FIELDS: bit n is the value and bit n + 8 says
+# the field is present; PRICE_PRESENT and SIZES_PRESENT mark the others.
+# size_codes lists the sizes each product is filtered by: its sizes list,
+# or the keys of a {colour: [sizes]} mapping, which itself goes to extras.
+# The filter indexes are stored too, as posting lists per value (values,
+# offsets, positions), along with product positions sorted by id.
+# key_order interns each product's keys as a JSON list, so rebuilt products
+# serialize exactly as they do in content.json.
+STRING_FIELDS = ('id', 'name', 'brand', 'category', 'currency')
+FLAG_FIELDS = ('new', 'sold', 'bestseller', 'priceOnRequest')
+COLUMN_FIELDS = STRING_FIELDS + FLAG_FIELDS + ('price', 'sizes', 'img')
+NONE = 0xFFFFFFFF
+PRICE_PRESENT = 1 << 14
+SIZES_PRESENT = 1 << 15
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def aligned(offset):
+    return offset + (-offset % ALIGNMENT)
+
+
+def check_columns(product):
+    """Raise ValueError if a column field of a product has a type its column can't hold"""
+    for field in COLUMN_FIELDS:
+        if field not in product:
+            continue
+        value = product[field]
+        if field in FLAG_FIELDS:
+            ok = isinstance(value, bool)
+        elif field == 'price':
+            ok = type(value) is int and INT64_MIN <= value <= INT64_MAX
+        elif field == 'sizes':
+            ok = isinstance(value, (list, dict)) and all(isinstance(size, str) for size in value)
+        else:
+            ok = isinstance(value, str)
+        if not ok:
+            raise ValueError(f"product {product.get('id')!r}: unsupported {field} {value!r}")
+    if 'id' not in product:
+        raise ValueError(f"product without an id: {json.dumps(product, ensure_ascii=False)[:80]}")
+
+
+def compile_catalog(data, source_size, source_mtime_ns):
+    """Bytes of the compiled form of parsed content.json data"""
+    products = data.get('products', [])
+    codes = {}
+
+    def intern(value):
+        return NONE if value is None else codes.setdefault(value, len(codes))
+
+    columns = {field: array.array('I') for field in STRING_FIELDS + ('img_dir', 'img_file', 'key_order')}
+    columns.update(price=array.array('q'), flags=array.array('H'),
+                   size_offsets=array.array('I', [0]), size_codes=array.array('I'),
+                   extra_offsets=array.array('I', [0]))
+    extras = bytearray()
+    postings = {'category': {}, 'brand': {}, 'size': {}}
+    flagged = {field: array.array('I') for field in FLAG_FIELDS}
+
+    for position, product in enumerate(products):
+        check_columns(product)
+        for field in STRING_FIELDS:
+            columns[field].append(intern(product.get(field)))
+        columns['key_order'].append(intern(json.dumps(list(product), ensure_ascii=False)))
+        for field in ('category', 'brand'):
+            postings[field].setdefault(columns[field][-1], []).append(position)
+        for size in dict.fromkeys(product.get('sizes') or ()):
+            postings['size'].setdefault(intern(size), []).append(position)
+        for field in FLAG_FIELDS:
+            if product.get(field):
+                flagged[field].append(position)
+        if 'img' in product:
+            directory, _, name = product['img'].rpartition('/')
+            columns['img_dir'].append(intern(directory + '/' if '/' in product['img'] else ''))
+            columns['img_file'].append(intern(name))
+        else:
+            columns['img_dir'].append(NONE)
+            columns['img_file'].append(NONE)
+
+        flags = 0
+        for bit, field in enumerate(FLAG_FIELDS):
+            if field in product:
+                flags |= 1 << (bit + 8) | product[field] << bit
+        if 'price' in product:
+            flags |= PRICE_PRESENT
+        if isinstance(product.get('sizes'), list):
+            flags |= SIZES_PRESENT
+        columns['size_codes'].extend(intern(size) for size in product.get('sizes') or ())
+        columns['flags'].append(flags)
+        columns['price'].append(product.get('price', 0))
+        columns['size_offsets'].append(len(columns['size_codes']))
+
+        extra = {key: value for key, value in product.items()
+                 if key not in COLUMN_FIELDS or key == 'sizes' and not flags & SIZES_PRESENT}
+        if extra:
+            extras += json.dumps(extra, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        columns['extra_offsets'].append(len(extras))
+
+    # The orders server.py's CatalogIndex sorts content.json products into
+    positions = range(len(products))
+    prices = [product.get('price', 0) for product in products]
+    columns['price_order'] = array.array('I', sorted(positions, key=lambda p: prices[p]))
+    columns['price_desc_order'] = array.array('I', sorted(positions, key=lambda p: -prices[p]))
+    columns['name_order'] = array.array('I', sorted(positions, key=lambda p: products[p].get('name', '').casefold()))
+    columns['sorted_prices'] = array.array('d', (prices[p] for p in columns['price_order']))
+    columns['id_order'] = array.array('I', sorted(positions, key=lambda p: products[p]['id']))
+    for name, members in postings.items():
+        columns[f'by_{name}_values'] = array.array('I', members)
+        columns[f'by_{name}_offsets'] = array.array('I', [0])
+        columns[f'by_{name}_positions'] = array.array('I')
+        for positions_with_value in members.values():
+            columns[f'by_{name}_positions'].extend(positions_with_value)
+            columns[f'by_{name}_offsets'].append(len(columns[f'by_{name}_positions']))
+    for field, members in flagged.items():
+        columns[f'flagged_{field}'] = members
+
+    strings = [value.encode('utf-8') for value in codes]
+    columns['string_offsets'] = array.array('I', [0])
+    for value in strings:
+        columns['string_offsets'].append(columns['string_offsets'][-1] + len(value))
+    document = {key: value for key, value in data.items() if key != 'products'}
+    blobs = {
+        'strings': b''.join(strings),
+        'extras': bytes(extras),
+        'document': json.dumps(document, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+    }
+
+    sections, body = {}, bytearray()
+    for name, values in list(columns.items()) + list(blobs.items()):
+        body += bytes(aligned(len(body)) - len(body))
+        raw = values.tobytes() if isinstance(values, array.array) else values
+        sections[name] = (len(body), len(raw), getattr(values, 'typecode', None))
+        body += raw
+
+    header = json.dumps({
+        'version': FORMAT_VERSION,
+        'byteorder': sys.byteorder,
+        'count': len(products),
+        'source': {'size': source_size, 'mtime_ns': source_mtime_ns},
+        'sections': sections,
+    }, separators=(',', ':')).encode('utf-8')
+    preamble = MAGIC + PREAMBLE.pack(len(header)) + header
+    return preamble + bytes(aligned(len(preamble)) - len(preamble)) + body
+
+
+class CompiledCatalog:
+    """Read-only, memory-mapped view of a content.bin
+
+    Also a sequence of products: catalog[position] rebuilds that product's
+    dict from the columns and its extra JSON.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        start = len(MAGIC) + PREAMBLE.size
+        if len(view) < start or view[:len(MAGIC)] != MAGIC:
+            raise ValueError("not a compiled catalogue")
+        (header_length,) = PREAMBLE.unpack_from(view, len(MAGIC))
+        header = json.loads(bytes(view[start:start + header_length]))
+        if header['version'] != FORMAT_VERSION or header['byteorder'] != sys.byteorder:
+            raise ValueError(f"format {header['version']}/{header['byteorder']} is not "
+                             f"{FORMAT_VERSION}/{sys.byteorder}, re-run compile_catalog.py")
+
+        base = aligned(start + header_length)
+        self.count = header['count']
+        self.source = header['source']
+        self._sections = {}
+        for name, (offset, length, typecode) in header['sections'].items():
+            section = view[base + offset:base + offset + length]
+            if len(section) != length:
+                raise ValueError(f"truncated section {name}")
+            self._sections[name] = section.cast(typecode) if typecode else section
+        self._strings = {}
+        self._key_orders = {}
+
+    def built_from(self, size, mtime_ns):
+        """Whether this was compiled from a content.json with this size and mtime"""
+        return self.source['size'] == size and self.source['mtime_ns'] == mtime_ns
+
+    def column(self, name):
+        return self._sections[name]
+
+    def string(self, code):
+        if code == NONE:
+            return None
+        value = self._strings.get(code)
+        if value is None:
+            offsets = self._sections['string_offsets']
+            value = str(self._sections['strings'][offsets[code]:offsets[code + 1]], 'utf-8')
+            self._strings[code] = value
+        return value
+
+    def document(self):
+        """Everything in content.json except its products"""
+        return json.loads(bytes(self._sections['document']))
+
+    def postings(self, name):
+        """{value: {positions}} for category, brand (None for products without one) or size"""
+        values = self._sections[f'by_{name}_values']
+        offsets = self._sections[f'by_{name}_offsets']
+        positions = self._sections[f'by_{name}_positions']
+        return {self.string(code): set(positions[offsets[i]:offsets[i + 1]]) for i, code in enumerate(values)}
+
+    def flagged(self, field):
+        """Positions of products whose flag is true"""
+        return set(self._sections[f'flagged_{field}'])
+
+    def ids(self):
+        return ProductIds(self)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, position):
+        if not 0 <= position < self.count:
+            raise IndexError(position)
+        product = {}
+        for field in STRING_FIELDS:
+            code = self._sections[field][position]
+            if code != NONE:
+                product[field] = self.string(code)
+        flags = self._sections['flags'][position]
+        if flags & PRICE_PRESENT:
+            product['price'] = self._sections['price'][position]
+        if flags & SIZES_PRESENT:
+            offsets = self._sections['size_offsets']
+            product['sizes'] = [self.string(code) for code in
+                                self._sections['size_codes'][offsets[position]:offsets[position + 1]]]
+        if self._sections['img_dir'][position] != NONE:
+            product['img'] = (self.string(self._sections['img_dir'][position])
+                              + self.string(self._sections['img_file'][position]))
+        for bit, field in enumerate(FLAG_FIELDS):
+            if flags & 1 << (bit + 8):
+                product[field] = bool(flags & 1 << bit)
+        offsets = self._sections['extra_offsets']
+        if offsets[position] != offsets[position + 1]:
+            product.update(json.loads(bytes(self._sections['extras'][offsets[position]:offsets[position + 1]])))
+
+        code = self._sections['key_order'][position]
+        keys = self._key_orders.get(code)
+        if keys is None:
+            keys = self._key_orders[code] = json.loads(self.string(code))
+        return {key: product[key] for key in keys}
+
+
+class ProductIds(Mapping):
+    """{product id: position} by binary search over the id_order column"""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.ids = catalog.column('id')
+        self.order = catalog.column('id_order')
+
+    def product_id(self, rank):
+        return self.catalog.string(self.ids[self.order[rank]])
+
+    def __getitem__(self, product_id):
+        # Rightmost match, so a repeated id means its last product, as in a dict
+        low, high = 0, len(self.order)
+        while low < high:
+            middle = (low + high) // 2
+            if product_id < self.product_id(middle):
+                high = middle
+            else:
+                low = middle + 1
+        if low == 0 or self.product_id(low - 1) != product_id:
+            raise KeyError(product_id)
+        return self.order[low - 1]
+
+    def __iter__(self):
+        return (self.catalog.string(code) for code in self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def write_atomic(path, body):
+    # Rename over the old file: server.py may have the old one mapped
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(body)
+    os.replace(tmp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--content', default=CONTENT_PATH)
+    parser.add_argument('--output', default=COMPILED_PATH)
+    args = parser.parse_args(argv)
+
+    stat = os.stat(args.content)
+    with open(args.content, 'rb') as f:
+        source = f.read()
+    data = json.loads(source)
+    try:
+        compiled = compile_catalog(data, stat.st_size, stat.st_mtime_ns)
+    except ValueError as e:
+        sys.exit(f"❌ {args.content}: {e}")
+    after = os.stat(args.content)
+    if (after.st_size, after.st_mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+        sys.exit(f"❌ {args.content} changed while compiling, run again")
+
+    write_atomic(args.output, compiled)
+    print(f"📦 {len(data.get('products', []))} products: {args.content} {len(source) / 1024:.0f}KB "
+          f"→ {args.output} {len(compiled) / 1024:.0f}KB")
+
+
+if __name__ == "__main__":
+    main()
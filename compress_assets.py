@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Precompress text assets into .gz and .br siblings for server.py"""
+
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+TEXT_EXTENSIONS = ('.html', '.css', '.js', '.json', '.svg', '.txt', '.xml')
+SKIP_DIRS = {'.git', '.cache', 'node_modules', 'bench', '__pycache__'}
+
+# Files this small gain nothing once headers are counted
+MIN_SIZE = 256
+
+
+def gzip_bytes(data, level=9):
+    """Gzip with a zeroed mtime so rebuilds produce identical files"""
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def brotli_bytes(data, quality=11):
+    return brotli.compress(data, quality=quality, mode=brotli.MODE_TEXT)
+
+
+ENCODERS = {'.gz': gzip_bytes}
+if brotli is not None:
+    ENCODERS['.br'] = brotli_bytes
+
+
+def compress_file(filepath):
+    """Write fresh siblings for one file, returning {suffix: size} written"""
+    written = {}
+    source_mtime = os.path.getmtime(filepath)
+    data = None
+    for suffix, encode in ENCODERS.items():
+        target = filepath + suffix
+        if os.path.exists(target) and os.path.getmtime(target) >= source_mtime:
+            continue
+        if data is None:
+            with open(filepath, 'rb') as f:
+                data = f.read()
+        tmp_path = target + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(encode(data))
+        os.replace(tmp_path, target)
+        written[suffix] = os.path.getsize(target)
+    return written
+
+
+def find_text_assets(root='.'):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            if name.endswith(TEXT_EXTENSIONS) and os.path.getsize(path) >= MIN_SIZE:
+                yield path
+
+
+def main():
+    print("🗜️  Precompressing text assets...")
+    if brotli is None:
+        print("  ⚠️  brotli module not installed - writing .gz only")
+
+    for filepath in find_text_assets():
+        written = compress_file(filepath)
+        if written:
+            original_size = os.path.getsize(filepath) / 1024
+            sizes = ', '.join(f"{suffix} {size / 1024:.1f}KB" for suffix, size in written.items())
+            print(f"  ✅ {filepath}: {original_size:.1f}KB → {sizes}")
+
+    print("\n✨ Compression complete!")
+
+if __name__ == "__main__":
+    main()
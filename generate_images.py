@@ -3,15 +3,31 @@
 Generate stylized placeholder images for Barboss Room products
 """
 
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+from PIL import Image, ImageColor, ImageDraw, ImageFont, ImageFilter
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import functools
+import hashlib
 import os
 import json
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Build gradients and repeating patterns as whole arrays when NumPy is
+# available; the PIL drawing loops below stay as the fallback
+USE_NUMPY = np is not None
+
 # Configuration
 IMAGE_WIDTH = 800
 IMAGE_HEIGHT = 1000
 CATEGORY_HEIGHT = 600
 
+FONT_BOLD = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+FONT_REGULAR = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+
 # Color palette - Dark premium style
 COLORS = {
     'bg_dark': '#0a0a0a',
@@ -26,24 +42,91 @@ COLORS = {
     'cp_company': '#1E3A5F'
 }
 
-def create_gradient_background(width, height, color1, color2):
-    """Create a gradient background"""
+@functools.lru_cache(maxsize=None)
+def get_font(path, size):
+    """Load a font once per (path, size), falling back to PIL's default font"""
+    try:
+        return ImageFont.truetype(path, size)
+    except OSError:
+        return ImageFont.load_default()
+
+def create_gradient_background(width, height, color1, color2, patterns=()):
+    """Create a gradient background, with optional repeating patterns on top
+    
+    patterns is a sequence of (tile_size, draw_tile, color) where
+    draw_tile(draw, x, y, fill) draws the shapes of one tile at (x, y);
+    shapes must fit inside the tile.
+    """
+    if USE_NUMPY:
+        return render_background_array(width, height, color1, color2, patterns)
+    
+    r1, g1, b1 = ImageColor.getrgb(color1)
+    r2, g2, b2 = ImageColor.getrgb(color2)
+    
     img = Image.new('RGB', (width, height), color1)
     draw = ImageDraw.Draw(img)
     
     for i in range(height):
         ratio = i / height
-        r1, g1, b1 = tuple(int(color1[j:j+2], 16) for j in (1, 3, 5))
-        r2, g2, b2 = tuple(int(color2[j:j+2], 16) for j in (1, 3, 5))
-        
         r = int(r1 * (1 - ratio) + r2 * ratio)
         g = int(g1 * (1 - ratio) + g2 * ratio)
         b = int(b1 * (1 - ratio) + b2 * ratio)
         
         draw.rectangle([(0, i), (width, i + 1)], fill=(r, g, b))
     
+    for (tile_width, tile_height), draw_tile, color in patterns:
+        for x in range(0, width, tile_width):
+            for y in range(0, height, tile_height):
+                draw_tile(draw, x, y, color)
+    
     return img
 
+def render_background_array(width, height, color1, color2, patterns=()):
+    """NumPy version of create_gradient_background
+    
+    Pixels are packed into one uint32 each (RGBX) so that filling rows
+    and stamping patterns are contiguous or strided array writes; the
+    result becomes a PIL image once at the end.
+    """
+    ratio = (np.arange(height) / height)[:, None]
+    rows = (np.array(ImageColor.getrgb(color1)) * (1 - ratio)
+            + np.array(ImageColor.getrgb(color2)) * ratio).astype(np.uint32)
+    canvas = np.empty((height, width), dtype=np.uint32)
+    canvas[:] = (rows[:, 0] | rows[:, 1] << 8 | rows[:, 2] << 16)[:, None]
+    
+    for (tile_width, tile_height), draw_tile, color in patterns:
+        r, g, b = ImageColor.getrgb(color)
+        for dy, dx in tile_offsets((tile_width, tile_height), draw_tile):
+            canvas[dy::tile_height, dx::tile_width] = r | g << 8 | b << 16
+    
+    return Image.frombytes('RGB', (width, height), canvas, 'raw', 'RGBX')
+
+def tile_offsets(tile_size, draw_tile):
+    """Pixel offsets covered by one tile of a pattern"""
+    tile = Image.new('L', tile_size, 0)
+    draw_tile(ImageDraw.Draw(tile), 0, 0, 255)
+    return np.argwhere(np.asarray(tile) > 0)
+
+def dot_tile(draw, x, y, fill):
+    """4px dots on a 40px grid wherever (x + y) % 80 == 0"""
+    for dx, dy in ((0, 0), (40, 40)):
+        draw.ellipse([(x + dx, y + dy), (x + dx + 3, y + dy + 3)], fill=fill)
+
+def square_tile(draw, x, y, fill):
+    """3px squares on a 20px grid wherever (x + y) % 40 == 0"""
+    for dx, dy in ((0, 0), (20, 20)):
+        draw.rectangle([(x + dx, y + dy), (x + dx + 2, y + dy + 2)], fill=fill)
+
+def grid_tile(draw, x, y, fill):
+    """1px horizontal and vertical lines every 40px"""
+    draw.line([(x, y), (x, y + 39)], fill=fill, width=1)
+    draw.line([(x, y), (x + 39, y)], fill=fill, width=1)
+
+# Texture overlays as (tile_size, draw_tile) for create_gradient_background
+DOT_TEXTURE = ((80, 80), dot_tile)
+SQUARE_TEXTURE = ((40, 40), square_tile)
+GRID_TEXTURE = ((40, 40), grid_tile)
+
 def add_brand_badge(img, brand):
     """Add brand badge to image"""
     draw = ImageDraw.Draw(img)
@@ -69,10 +152,7 @@ def add_brand_badge(img, brand):
     )
     
     # Badge text
-    try:
-        font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 16)
-    except:
-        font = ImageFont.load_default()
+    font = get_font(FONT_BOLD, 16)
     
     text_bbox = draw.textbbox((0, 0), brand.upper(), font=font)
     text_width = text_bbox[2] - text_bbox[0]
@@ -90,14 +170,9 @@ def add_product_text(img, name, price, is_sold=False):
     draw = ImageDraw.Draw(img)
     
     # Load fonts
-    try:
-        font_large = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 32)
-        font_medium = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 24)
-        font_small = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 18)
-    except:
-        font_large = ImageFont.load_default()
-        font_medium = ImageFont.load_default()
-        font_small = ImageFont.load_default()
+    font_large = get_font(FONT_BOLD, 32)
+    font_medium = get_font(FONT_REGULAR, 24)
+    font_small = get_font(FONT_REGULAR, 18)
     
     # Product name (multi-line)
     y_offset = IMAGE_HEIGHT - 250
@@ -151,37 +226,31 @@ def add_product_text(img, name, price, is_sold=False):
     
     return img
 
-def create_product_image(product):
-    """Create a product image"""
-    # Create gradient background
-    if 'Stone Island' in product.get('brand', ''):
+@functools.lru_cache(maxsize=128)
+def product_base_canvas(brand, category):
+    """Everything on a product image except its name and price
+    
+    Rendered once per (brand, category); callers must copy() it.
+    """
+    # Create gradient background with a dot pattern overlay for texture
+    texture = [(*DOT_TEXTURE, COLORS['bg_light'])]
+    if 'Stone Island' in brand:
         img = create_gradient_background(IMAGE_WIDTH, IMAGE_HEIGHT, 
-                                        COLORS['bg_dark'], COLORS['stone_island'])
-    elif 'C.P. Company' in product.get('brand', ''):
+                                        COLORS['bg_dark'], COLORS['stone_island'], texture)
+    elif 'C.P. Company' in brand:
         img = create_gradient_background(IMAGE_WIDTH, IMAGE_HEIGHT, 
-                                        COLORS['bg_dark'], COLORS['cp_company'])
+                                        COLORS['bg_dark'], COLORS['cp_company'], texture)
     else:
         img = create_gradient_background(IMAGE_WIDTH, IMAGE_HEIGHT, 
-                                        COLORS['bg_dark'], COLORS['bg_medium'])
+                                        COLORS['bg_dark'], COLORS['bg_medium'], texture)
     
-    # Add pattern overlay for texture
     draw = ImageDraw.Draw(img)
-    for i in range(0, IMAGE_WIDTH, 40):
-        for j in range(0, IMAGE_HEIGHT, 40):
-            if (i + j) % 80 == 0:
-                draw.ellipse([(i, j), (i + 3, j + 3)], fill=COLORS['bg_light'])
     
     # Add product silhouette based on category
-    category = product.get('category', '')
     draw_product_silhouette(draw, category)
     
     # Add brand badge
-    img = add_brand_badge(img, product.get('brand', 'BARBOSS'))
-    
-    # Add product text
-    img = add_product_text(img, product.get('name', ''), 
-                          product.get('price', 0), 
-                          product.get('sold', False))
+    img = add_brand_badge(img, brand or 'BARBOSS')
     
     # Add Ukrainian flag stripe
     draw.rectangle([(0, IMAGE_HEIGHT - 10), (IMAGE_WIDTH, IMAGE_HEIGHT - 5)], 
@@ -191,6 +260,17 @@ def create_product_image(product):
     
     return img
 
+def create_product_image(product):
+    """Create a product image"""
+    img = product_base_canvas(product.get('brand', 'BARBOSS'), product.get('category', '')).copy()
+    
+    # Add product text
+    img = add_product_text(img, product.get('name', ''), 
+                          product.get('price', 0), 
+                          product.get('sold', False))
+    
+    return img
+
 def draw_product_silhouette(draw, category):
     """Draw product silhouette based on category"""
     center_x = IMAGE_WIDTH // 2
@@ -268,8 +348,9 @@ def draw_product_silhouette(draw, category):
             fill=COLORS['bg_light'], outline=COLORS['accent'], width=2
         )
 
-def create_category_image(category_name, category_id):
-    """Create a category banner image"""
+@functools.lru_cache(maxsize=1)
+def category_base_canvas():
+    """Shared category banner background; callers must copy() it"""
     img = create_gradient_background(IMAGE_WIDTH, CATEGORY_HEIGHT, 
                                     COLORS['bg_dark'], COLORS['bg_medium'])
     
@@ -282,13 +363,16 @@ def create_category_image(category_name, category_id):
         draw.line([(i + 30, 0), (i, CATEGORY_HEIGHT)], 
                  fill=COLORS['bg_light'], width=1)
     
+    return img
+
+def create_category_image(category_name, category_id):
+    """Create a category banner image"""
+    img = category_base_canvas().copy()
+    draw = ImageDraw.Draw(img)
+    
     # Add category name
-    try:
-        font_large = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 64)
-        font_medium = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 32)
-    except:
-        font_large = ImageFont.load_default()
-        font_medium = ImageFont.load_default()
+    font_large = get_font(FONT_BOLD, 64)
+    font_medium = get_font(FONT_REGULAR, 32)
     
     # Main text
     text_bbox = draw.textbbox((0, 0), category_name.upper(), font=font_large)
@@ -322,29 +406,29 @@ def create_category_image(category_name, category_id):
     
     return img
 
-def create_lookbook_image(index, title):
-    """Create a lookbook lifestyle image"""
+@functools.lru_cache(maxsize=1)
+def lookbook_base_canvas():
+    """Shared lookbook background; callers must copy() it"""
+    # Gradient background with an urban texture pattern
     img = create_gradient_background(IMAGE_WIDTH, IMAGE_HEIGHT, 
-                                    '#0a0a0a', '#2a2a2a')
+                                    '#0a0a0a', '#2a2a2a', [(*SQUARE_TEXTURE, '#333333')])
     
     draw = ImageDraw.Draw(img)
     
-    # Add urban texture pattern
-    for i in range(0, IMAGE_WIDTH, 20):
-        for j in range(0, IMAGE_HEIGHT, 20):
-            if (i + j) % 40 == 0:
-                draw.rectangle([(i, j), (i + 2, j + 2)], fill='#333333')
-    
     # Add diagonal lines for dynamic effect
     for i in range(-IMAGE_HEIGHT, IMAGE_WIDTH, 100):
         draw.line([(i, 0), (i + IMAGE_HEIGHT, IMAGE_HEIGHT)], 
                  fill='#1a1a1a', width=2)
     
+    return img
+
+def create_lookbook_image(index, title):
+    """Create a lookbook lifestyle image"""
+    img = lookbook_base_canvas().copy()
+    draw = ImageDraw.Draw(img)
+    
     # Add title
-    try:
-        font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 48)
-    except:
-        font = ImageFont.load_default()
+    font = get_font(FONT_BOLD, 48)
     
     text_bbox = draw.textbbox((0, 0), title.upper(), font=font)
     text_width = text_bbox[2] - text_bbox[0]
@@ -371,22 +455,20 @@ def create_lookbook_image(index, title):
     
     return img
 
+def clear_render_caches():
+    """Forget cached base canvases, e.g. after switching USE_NUMPY"""
+    product_base_canvas.cache_clear()
+    category_base_canvas.cache_clear()
+    lookbook_base_canvas.cache_clear()
+
 def create_hero_background():
     """Create hero banner background"""
-    img = create_gradient_background(1920, 1080, '#000000', '#1a1a1a')
+    # Gradient background with a grid pattern
+    img = create_gradient_background(1920, 1080, '#000000', '#1a1a1a', [(*GRID_TEXTURE, '#0a0a0a')])
     draw = ImageDraw.Draw(img)
     
-    # Add grid pattern
-    for i in range(0, 1920, 40):
-        draw.line([(i, 0), (i, 1080)], fill='#0a0a0a', width=1)
-    for j in range(0, 1080, 40):
-        draw.line([(0, j), (1920, j)], fill='#0a0a0a', width=1)
-    
     # Add BARBOSS text watermark
-    try:
-        font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 120)
-    except:
-        font = ImageFont.load_default()
+    font = get_font(FONT_BOLD, 120)
     
     draw.text((100, 400), "BARBOSS", fill='#111111', font=font)
     draw.text((900, 600), "ROOM", fill='#111111', font=font)
@@ -397,25 +479,86 @@ def create_hero_background():
     
     return img
 
-def main():
+# Fingerprints of what each output was rendered from, so unchanged images
+# are skipped. Bump RENDER_VERSION when the drawing code changes.
+RENDER_MANIFEST_PATH = '.generate-manifest.json'
+RENDER_VERSION = 1
+PRODUCT_RENDER_FIELDS = ('name', 'brand', 'category', 'price', 'sold')
+
+def render_fingerprint(*values):
+    raw = json.dumps([RENDER_VERSION, *values], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def product_fingerprint(product):
+    """Hash of the product fields that show up on its image"""
+    return render_fingerprint({field: product.get(field) for field in PRODUCT_RENDER_FIELDS})
+
+def load_render_manifest():
+    try:
+        with open(RENDER_MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_render_manifest(manifest):
+    tmp_path = RENDER_MANIFEST_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, RENDER_MANIFEST_PATH)
+
+def render_product(product):
+    """Render and save one product image (runs in a worker process with --jobs)"""
+    filename = product['id'] + '.jpg'
+    filepath = os.path.join('public/assets/products', filename)
+    
+    img = create_product_image(product)
+    img.save(filepath, 'JPEG', quality=85, optimize=True)
+    return filename
+
+def main(argv=None):
     """Generate all images"""
+    parser = argparse.ArgumentParser(description="Generate placeholder images for Barboss Room")
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help="worker processes for product images (default: 1)")
+    parser.add_argument('--force', action='store_true',
+                        help="re-render every image even if its inputs are unchanged")
+    args = parser.parse_args(argv)
+    
     print("🎨 Generating Barboss Room product images...")
     
     # Load products from JSON
     with open('content.json', 'r', encoding='utf-8') as f:
-        data = json.load(f)
+        original_json = f.read()
+    data = json.loads(original_json)
+    
+    previous = load_render_manifest()
+    manifest = {}
+    
+    def is_stale(key, fingerprint, filepath):
+        manifest[key] = fingerprint
+        return args.force or previous.get(key) != fingerprint or not os.path.exists(filepath)
     
     # Create product images
-    print("\n📦 Creating product images...")
-    for product in data['products']:
-        filename = product['id'] + '.jpg'
-        filepath = os.path.join('public/assets/products', filename)
-        
-        img = create_product_image(product)
-        img.save(filepath, 'JPEG', quality=85, optimize=True)
+    products = data['products']
+    pending = [product for product in products
+               if is_stale(f"products/{product['id']}", product_fingerprint(product),
+                           os.path.join('public/assets/products', product['id'] + '.jpg'))]
+    print(f"\n📦 Creating {len(pending)} of {len(products)} product images ({args.jobs} jobs)...")
+    if args.jobs > 1 and len(pending) > 1:
+        # Each worker keeps its own fonts and base canvases; bigger chunks
+        # mean fewer round trips per product
+        chunksize = max(1, len(pending) // (args.jobs * 4))
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            filenames = list(pool.map(render_product, pending, chunksize=chunksize))
+    else:
+        filenames = [render_product(product) for product in pending]
+    
+    for product, filename in zip(pending, filenames):
         print(f"  ✅ {filename} - {product['name'][:40]}...")
-        
+    
+    for product in products:
         # Update product image paths in JSON
+        filename = product['id'] + '.jpg'
         product['img'] = f"/assets/products/{filename}"
         if 'gallery' not in product or not product['gallery']:
             product['gallery'] = [f"/assets/products/{filename}"]
@@ -432,6 +575,8 @@ def main():
     for name, cat_id in categories:
         filename = f"category-{cat_id}.jpg"
         filepath = os.path.join('public/assets/img', filename)
+        if not is_stale(f"img/{filename}", render_fingerprint(name), filepath):
+            continue
         
         img = create_category_image(name, cat_id)
         img.save(filepath, 'JPEG', quality=85, optimize=True)
@@ -451,6 +596,8 @@ def main():
     for i, title in enumerate(lookbook_titles, 1):
         filename = f"look-{i:02d}.jpg"
         filepath = os.path.join('public/assets/lookbook', filename)
+        if not is_stale(f"lookbook/{filename}", render_fingerprint(title), filepath):
+            continue
         
         img = create_lookbook_image(i, title)
         img.save(filepath, 'JPEG', quality=85, optimize=True)
@@ -458,16 +605,25 @@ def main():
     
     # Create hero background
     print("\n🏠 Creating hero background...")
-    hero_img = create_hero_background()
-    hero_img.save('public/assets/img/hero-bg.jpg', 'JPEG', quality=90, optimize=True)
-    print("  ✅ hero-bg.jpg")
-    
-    # Update and save JSON with new image paths
-    with open('content.json', 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    hero_path = 'public/assets/img/hero-bg.jpg'
+    if is_stale("img/hero-bg.jpg", render_fingerprint('hero'), hero_path):
+        hero_img = create_hero_background()
+        hero_img.save(hero_path, 'JPEG', quality=90, optimize=True)
+        print("  ✅ hero-bg.jpg")
+    
+    save_render_manifest(manifest)
+    
+    # Update and save JSON with new image paths, only if they changed
+    updated_json = json.dumps(data, ensure_ascii=False, indent=2)
+    if updated_json != original_json:
+        # Rename over the old file so server.py never reads a half-written one
+        with open('content.json.tmp', 'w', encoding='utf-8') as f:
+            f.write(updated_json)
+        os.replace('content.json.tmp', 'content.json')
+        print("\n📝 content.json updated")
     
     print("\n✨ All images generated successfully!")
     print(f"📊 Total: {len(data['products'])} products, {len(categories)} categories, {len(lookbook_titles)} lookbook images")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""Publish content-hashed copies of public/assets and point the site at them
+
+/assets/* is served with a year-long immutable Cache-Control, but the image
+pipelines rewrite files such as products/si-camo-pants-001.jpg in place.
+This step copies every referenced asset to a name carrying its content hash
+(products/si-camo-pants-001.3f2a9c1b.jpg) and rewrites the references in
+content.json, derivatives.json, the HTML pages, styles.css and the JS, so
+a changed image always gets a new URL.
+
+The fixed names stay the pipelines' working files: generate_images.py and
+optimize_images.py keep writing them, and rerunning this step after them
+moves the references on to the new hashes. It also reports images nothing
+references, references to files that don't exist, and hashed copies left
+over from earlier runs (deleted with --prune).
+
+Deploys run it with --deploy, which afterwards deletes the working files
+that have a hashed copy and the stale copies, then fails if any asset is
+still there under both names, so the upload carries each one once. Only
+use it in a deploy checkout: the pipelines need the working files.
+
+Run it after the image pipelines and update_catalog.py, and before
+compile_catalog.py, render_pages.py and compress_assets.py:
+
+    python3 hash_assets.py [--dry-run] [--prune] [--strict] [--deploy]
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+
+CONTENT_PATH = 'content.json'
+PUBLIC_DIR = 'public'
+ASSETS_DIR = os.path.join(PUBLIC_DIR, 'assets')
+DERIVATIVES_URL = '/assets/derivatives.json'
+TEXT_PATTERNS = ('*.html', 'styles.css', '*.js')
+
+HASH_LENGTH = 8
+HASHED_NAME = re.compile(r'^(?P<stem>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.\w+)$' % HASH_LENGTH)
+HASHED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.avif', '.gif', '.svg', '.json')
+ASSET_URL = re.compile(r'/assets/[\w./-]+?(?:%s)\b' % '|'.join(re.escape(ext) for ext in HASHED_EXTENSIONS))
+
+
+def is_hashed(path):
+    return HASHED_NAME.match(os.path.basename(path)) is not None
+
+
+def logical_path(url):
+    """The working name behind an /assets/ URL, with any content hash removed"""
+    directory, name = os.path.split(url)
+    match = HASHED_NAME.match(name)
+    return f"{directory}/{match['stem']}{match['ext']}" if match else url
+
+
+def public_file(url):
+    return os.path.join(PUBLIC_DIR, url.lstrip('/'))
+
+
+def hashed_url(url):
+    """/assets/dir/name.<hash>.ext for the current bytes of an /assets/ URL"""
+    sha256 = hashlib.sha256()
+    with open(public_file(url), 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    stem, ext = os.path.splitext(url)
+    return f"{stem}.{sha256.hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def walk_strings(value, visit):
+    """Replace every string in a JSON value with visit(string)"""
+    if isinstance(value, dict):
+        return {key: walk_strings(item, visit) for key, item in value.items()}
+    if isinstance(value, list):
+        return [walk_strings(item, visit) for item in value]
+    if isinstance(value, str):
+        return visit(value)
+    return value
+
+
+def read_text(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def write_text(path, text):
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(path + '.tmp', path)
+
+
+def publish(url, hashed):
+    """Copy the working file to its hashed name (copied, not linked: PIL saves in place)"""
+    target = public_file(hashed)
+    if not os.path.exists(target):
+        shutil.copy2(public_file(url), target + '.tmp')
+        os.replace(target + '.tmp', target)
+
+
+class AssetHasher:
+    """Maps referenced /assets/ URLs to their hashed names, remembering what was missing"""
+
+    def __init__(self):
+        self.hashed = {}
+        self.referenced = set()
+        self.missing = {}
+
+    def resolve(self, url, where):
+        logical = logical_path(url)
+        if logical in self.hashed:
+            return self.hashed[logical]
+        self.referenced.add(logical)
+        if os.path.isfile(public_file(logical)):
+            self.hashed[logical] = hashed_url(logical)
+            return self.hashed[logical]
+        if not os.path.isfile(public_file(url)):
+            # derivatives.json only exists once optimize_images.py has run,
+            # and main.js does without it
+            if logical != DERIVATIVES_URL:
+                self.missing.setdefault(url, set()).add(where)
+        else:
+            # A hashed copy whose working file is gone stays as it is
+            self.hashed[url] = url
+        return url
+
+    def rewrite_json(self, value, where):
+        """A JSON value with every string that is an /assets/ URL hashed"""
+        return walk_strings(value, lambda text: self.resolve(text, where) if ASSET_URL.fullmatch(text) else text)
+
+    def rewrite_text(self, text, where):
+        return ASSET_URL.sub(lambda match: self.resolve(match.group(0), where), text)
+
+
+def rewrite_derivatives(derivatives, hasher):
+    """derivatives.json keyed and pointing at hashed URLs for the images the site uses"""
+    rewritten = {}
+    for key, entry in derivatives.items():
+        # Keyed by the hashed URL alone once --deploy has deleted the working file
+        hashed_key = hasher.hashed.get(logical_path(key)) or hasher.hashed.get(key)
+        if hashed_key:
+            entry = dict(entry, variants=[dict(variant, src=hasher.resolve(variant['src'], DERIVATIVES_URL))
+                                          for variant in entry['variants']])
+            key = hashed_key
+        rewritten[key] = entry
+    return rewritten
+
+
+def duplicated_assets():
+    """Working files that still sit next to a hashed copy of themselves"""
+    files = asset_files()
+    hashed = {logical_path(url) for url in files if is_hashed(url)}
+    return [url for url in files if not is_hashed(url) and url in hashed]
+
+
+def asset_files():
+    """/assets/ URLs of every file under public/assets"""
+    urls = []
+    for dirpath, _, filenames in os.walk(ASSETS_DIR):
+        for filename in filenames:
+            if filename.lower().endswith(HASHED_EXTENSIONS):
+                urls.append('/' + os.path.relpath(os.path.join(dirpath, filename), PUBLIC_DIR).replace(os.sep, '/'))
+    return sorted(urls)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--content', default=CONTENT_PATH)
+    parser.add_argument('--dry-run', action='store_true', help="report without copying or rewriting anything")
+    parser.add_argument('--prune', action='store_true', help="delete hashed copies nothing references any more")
+    parser.add_argument('--strict', action='store_true', help="exit with status 1, writing nothing, if a reference is missing")
+    parser.add_argument('--deploy', action='store_true',
+                        help="then delete the working files that have a hashed copy, and stale copies (deploy checkouts only)")
+    args = parser.parse_args(argv)
+
+    print("🔐 Hashing asset names...")
+    hasher = AssetHasher()
+    updates = {}
+
+    with open(args.content, 'r', encoding='utf-8') as f:
+        original_json = f.read()
+    original_data = json.loads(original_json)
+    data = hasher.rewrite_json(original_data, args.content)
+    updates[args.content] = original_json if data == original_data else json.dumps(data, ensure_ascii=False, indent=2)
+
+    texts = {}
+    for pattern in TEXT_PATTERNS:
+        for path in sorted(glob.glob(pattern)):
+            texts[path] = read_text(path)
+            updates[path] = hasher.rewrite_text(texts[path], path)
+
+    # Variants of the images in use are referenced through derivatives.json,
+    # which itself is only hashed once its contents are final
+    derivatives_path = public_file(DERIVATIVES_URL)
+    derivatives_json = read_text(derivatives_path)
+    if derivatives_json is not None:
+        derivatives = rewrite_derivatives(json.loads(derivatives_json), hasher)
+        updates[derivatives_path] = json.dumps(derivatives, separators=(',', ':'))
+        hashed_derivatives = hashlib.sha256(updates[derivatives_path].encode('utf-8')).hexdigest()[:HASH_LENGTH]
+        hasher.hashed[DERIVATIVES_URL] = f"/assets/derivatives.{hashed_derivatives}.json"
+        for path in texts:
+            updates[path] = ASSET_URL.sub(
+                lambda match: hasher.hashed[DERIVATIVES_URL] if logical_path(match.group(0)) == DERIVATIVES_URL
+                else match.group(0), updates[path])
+
+    originals = {args.content: original_json, derivatives_path: derivatives_json, **texts}
+    changed = [path for path, text in updates.items() if text != originals[path]]
+    published = set(hasher.hashed.values())
+    new_copies = sorted(url for url in published if not os.path.exists(public_file(url)))
+    files = asset_files()
+    unreferenced = [url for url in files if not is_hashed(url) and url not in hasher.referenced]
+    stale = [url for url in files if is_hashed(url) and url not in published]
+
+    for url in unreferenced:
+        print(f"  🗑️  unreferenced: {url}")
+    for url, places in sorted(hasher.missing.items()):
+        print(f"  ❌ missing: {url} (in {', '.join(sorted(places))})")
+    for path in changed:
+        print(f"  ✏️  {path}")
+    print(f"\n📦 {len(published)} referenced assets, {len(new_copies)} new hashed copies, "
+          f"{len(unreferenced)} unreferenced, {len(hasher.missing)} missing, {len(stale)} stale copies")
+
+    if args.strict and hasher.missing:
+        sys.exit(f"\n❌ {len(hasher.missing)} missing asset(s), nothing written")
+    if args.dry_run:
+        return
+
+    for logical, hashed in sorted(hasher.hashed.items()):
+        if logical != DERIVATIVES_URL:
+            publish(logical, hashed)
+    for path in changed:
+        if path != derivatives_path:
+            write_text(path, updates[path])
+    if derivatives_json is not None:
+        # The hashed copy gets the rewritten contents; the working file is
+        # rewritten too so server.py and render_pages.py look up hashed keys
+        write_text(public_file(hasher.hashed[DERIVATIVES_URL]), updates[derivatives_path])
+        if derivatives_path in changed:
+            write_text(derivatives_path, updates[derivatives_path])
+    if args.prune or args.deploy:
+        for url in stale:
+            os.remove(public_file(url))
+        print(f"🧹 {len(stale)} stale hashed copies deleted")
+    if changed:
+        print(f"📝 {len(changed)} files now point at hashed assets")
+    if args.deploy:
+        working = sorted(logical for logical, hashed in hasher.hashed.items() if logical != hashed)
+        for url in working:
+            os.remove(public_file(url))
+        print(f"🚚 {len(working)} working files deleted, the deploy ships hashed copies only")
+        duplicates = duplicated_assets()
+        if duplicates:
+            sys.exit(f"❌ {len(duplicates)} asset(s) would ship twice: {', '.join(duplicates)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,25 @@
 let contentData = {};
 let currentProducts = [];
 let filteredProducts = [];
+let imageDerivatives = {};
+
+// Server-side catalogue queries (server.py /api/products); static hosts
+// without the API fall back to filtering contentData in the browser
+const PRODUCTS_API = '/api/products';
+const SEARCH_API = '/api/search';
+const SEARCH_DELAY = 150;
+const MIN_PREFIX_LENGTH = 2;  // shorter terms only match whole words, as in server.py
+const SHOP_PAGE_SIZE = 24;
+let shopApiAvailable = true;
+let shopTotal = 0;
+let shopRequest = 0;
+
+// Rendered width of product images, for picking from srcset
+const PRODUCT_IMAGE_SIZES = '(max-width: 768px) 50vw, 300px';
 
 // Initialize app when DOM is loaded
 document.addEventListener('DOMContentLoaded', async () => {
-    await loadContent();
+    await Promise.all([loadContent(), loadDerivatives()]);
     initializeNavigation();
     initializePageContent();
     initializeParallax();
@@ -17,11 +32,11 @@ document.addEventListener('DOMContentLoaded', async () => {
     initializeImageOptimization();
 });
 
-// Load content from JSON
+// Load content from JSON: the page's own slice from server.py when it is
+// there, the whole content.json otherwise (static hosting)
 async function loadContent() {
     try {
-        const response = await fetch('content.json');
-        contentData = await response.json();
+        contentData = await loadPagePayload() || await fetchJSON('content.json');
         currentProducts = contentData.products || [];
         filteredProducts = [...currentProducts];
     } catch (error) {
@@ -36,6 +51,84 @@ async function loadContent() {
     }
 }
 
+async function fetchJSON(url) {
+    const response = await fetch(url);
+    if (!response.ok) {
+        throw new Error(`${url} returned ${response.status}`);
+    }
+    return response.json();
+}
+
+// Per-page payload shaped like content.json, or null to use content.json
+async function loadPagePayload() {
+    const currentPage = window.location.pathname.split('/').pop() || 'index.html';
+    try {
+        switch (currentPage) {
+            case 'index.html':
+                return await fetchJSON('/api/home');
+            case 'shop.html':
+                return await fetchJSON('/api/shop');
+            case 'product.html': {
+                const productId = new URLSearchParams(window.location.search).get('id');
+                if (!productId) return null;
+                const { product, related } = await fetchJSON(`/api/products/${encodeURIComponent(productId)}`);
+                return { products: [product, ...related] };
+            }
+            case 'about.html':
+            case 'contacts.html':
+                return await fetchJSON('/api/site');
+        }
+    } catch (error) {
+        // No API on this host
+    }
+    return null;
+}
+
+// Load responsive image variants written by optimize_images.py
+async function loadDerivatives() {
+    try {
+        const response = await fetch('/assets/derivatives.json');
+        if (response.ok) {
+            imageDerivatives = await response.json();
+        }
+    } catch (error) {
+        // Plain <img> tags work without it
+    }
+}
+
+// Blur-up placeholder from content.json imgMeta: the dominant colour and a
+// tiny inlined WebP painted behind the image until it streams in
+function imagePlaceholder(meta) {
+    if (!meta) return '';
+    return `width="${meta.width}" height="${meta.height}" data-placeholder ` +
+        `style="background: ${meta.color} url(${meta.placeholder}) center / cover no-repeat"`;
+}
+
+// <picture> with AVIF/WebP/JPEG srcsets, smallest format first
+function responsiveImage(src, alt, sizes, attributes = '', meta = null) {
+    const entry = imageDerivatives[src];
+    if (!entry) {
+        return `<img src="${src}" alt="${alt}" ${imagePlaceholder(meta)} ${attributes}>`;
+    }
+
+    const byFormat = {};
+    entry.variants.forEach(variant => {
+        (byFormat[variant.format] = byFormat[variant.format] || []).push(variant);
+    });
+    const totalBytes = variants => variants.reduce((sum, variant) => sum + variant.bytes, 0);
+    const srcset = variants => variants.map(variant => `${variant.src} ${variant.width}w`).join(', ');
+
+    const sources = Object.keys(byFormat)
+        .filter(format => format !== 'jpeg')
+        .sort((a, b) => totalBytes(byFormat[a]) - totalBytes(byFormat[b]))
+        .map(format => `<source type="image/${format}" srcset="${srcset(byFormat[format])}" sizes="${sizes}">`)
+        .join('');
+    const jpegSrcset = byFormat.jpeg ? ` srcset="${srcset(byFormat.jpeg)}" sizes="${sizes}"` : '';
+
+    const dimensions = meta ? imagePlaceholder(meta) : `width="${entry.width}" height="${entry.height}"`;
+    return `<picture>${sources}<img src="${src}"${jpegSrcset} alt="${alt}" ${dimensions} ${attributes}></picture>`;
+}
+
 // Initialize navigation
 function initializeNavigation() {
     const navbar = document.getElementById('navbar');
@@ -112,6 +205,7 @@ function loadCategories() {
 
     grid.innerHTML = contentData.categories.map(category => `
         <a href="${category.url}" class="category-card">
+            ${category.img ? responsiveImage(category.img, category.name, '(max-width: 768px) 50vw, 25vw', 'loading="lazy"', category.imgMeta) : ''}
             <div class="category-overlay">
                 <h3 class="category-title">${category.name}</h3>
             </div>
@@ -141,7 +235,7 @@ function loadLookbook() {
 
     gallery.innerHTML = contentData.lookbook.map((item, index) => `
         <div class="lookbook-item">
-            <img src="${item.img}" alt="${item.title || 'Lookbook ' + (index + 1)}" loading="lazy">
+            ${responsiveImage(item.img, item.title || 'Lookbook ' + (index + 1), '(max-width: 768px) 100vw, 33vw', 'loading="lazy"', item.imgMeta)}
         </div>
     `).join('');
 }
@@ -159,7 +253,7 @@ function createProductCard(product) {
             <div class="product-image">
                 ${product.new && !product.sold ? '<span class="product-badge">NEW</span>' : ''}
                 ${product.sold ? '<span class="product-badge" style="background: red;">SOLD</span>' : ''}
-                <img src="${product.img}" alt="${product.name}" loading="lazy">
+                ${responsiveImage(product.img, product.name, PRODUCT_IMAGE_SIZES, 'loading="lazy"', product.imgMeta)}
             </div>
             <div class="product-info">
                 <div class="product-brand">${product.brand}</div>
@@ -242,7 +336,11 @@ function initializeSlider() {
 // ============================================
 
 function initializeShopPage() {
-    loadShopProducts();
+    // render_pages.py already filled in the listing and filters
+    const prerendered = Boolean(document.body.dataset.prerendered);
+    if (!prerendered) {
+        loadShopProducts();
+    }
     initializeFilters();
     initializeSorting();
     initializeMobileFilters();
@@ -250,31 +348,35 @@ function initializeShopPage() {
     // Check URL parameters for initial filters
     const urlParams = new URLSearchParams(window.location.search);
     const category = urlParams.get('cat');
-    const filter = urlParams.get('filter');
+    const searchInput = document.getElementById('searchInput');
+    if (searchInput && urlParams.get('q')) {
+        searchInput.value = urlParams.get('q');
+    }
     
     if (category) {
         const checkbox = document.querySelector(`#categoryFilter input[value="${category}"]`);
         if (checkbox) {
             checkbox.checked = true;
-            applyFilters();
         }
     }
     
-    if (filter === 'new') {
-        filteredProducts = currentProducts.filter(p => p.new);
-        displayProducts();
-    } else if (filter === 'bestseller') {
-        filteredProducts = currentProducts.filter(p => p.bestseller);
-        displayProducts();
+    const loadMore = document.getElementById('loadMore');
+    if (loadMore) {
+        loadMore.addEventListener('click', loadMoreProducts);
+    }
+    
+    if (prerendered) {
+        shopTotal = Number(document.getElementById('resultsCount')?.textContent) || 0;
+    } else {
+        applyFilters();
     }
 }
 
 function loadShopProducts() {
-    displayProducts();
     loadBrandFilters();
 }
 
-function displayProducts() {
+function displayProducts(total = filteredProducts.length) {
     const grid = document.getElementById('productsGrid');
     const noResults = document.getElementById('noResults');
     const resultsCount = document.getElementById('resultsCount');
@@ -288,9 +390,18 @@ function displayProducts() {
     } else {
         grid.style.display = 'grid';
         if (noResults) noResults.style.display = 'none';
-        if (resultsCount) resultsCount.textContent = filteredProducts.length;
+        if (resultsCount) resultsCount.textContent = total;
         grid.innerHTML = filteredProducts.map(product => createProductCard(product)).join('');
     }
+    
+    updateLoadMore(filteredProducts.length, total);
+}
+
+function updateLoadMore(shown, total) {
+    const loadMore = document.getElementById('loadMore');
+    if (loadMore) {
+        loadMore.style.display = shown < total ? 'inline-block' : 'none';
+    }
 }
 
 function loadBrandFilters() {
@@ -333,6 +444,16 @@ function initializeFilters() {
         });
     });
 
+    // Search, once typing pauses
+    const searchInput = document.getElementById('searchInput');
+    if (searchInput) {
+        let searchTimer;
+        searchInput.addEventListener('input', () => {
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(applyFilters, SEARCH_DELAY);
+        });
+    }
+
     // Clear filters
     const clearBtn = document.getElementById('clearFilters');
     if (clearBtn) {
@@ -340,9 +461,129 @@ function initializeFilters() {
     }
 }
 
-function applyFilters() {
+// Current search, filter and sort selection as /api/products (or, with
+// a search term, /api/search) query parameters
+function shopQueryParams() {
+    const params = new URLSearchParams();
+    
+    const search = document.getElementById('searchInput')?.value.trim();
+    if (search) {
+        params.set('q', search);
+    }
+    
+    document.querySelectorAll('#categoryFilter input:checked')
+        .forEach(input => params.append('category', input.value));
+    document.querySelectorAll('#brandFilter input:checked')
+        .forEach(input => params.append('brand', input.value));
+    document.querySelectorAll('.size-option.active')
+        .forEach(btn => params.append('size', btn.dataset.size));
+    
+    const selectedPrice = document.querySelector('input[name="price"]:checked');
+    if (selectedPrice) {
+        const priceRange = selectedPrice.value;
+        if (priceRange === '0-500') {
+            params.set('price_max', '499');
+        } else if (priceRange === '500-1000') {
+            params.set('price_min', '500');
+            params.set('price_max', '1000');
+        } else if (priceRange === '1000+') {
+            params.set('price_min', '1001');
+        }
+    }
+    
+    const filter = new URLSearchParams(window.location.search).get('filter');
+    if (filter === 'new' || filter === 'bestseller') {
+        params.set(filter, 'true');
+    }
+    
+    const sortSelect = document.getElementById('sortSelect');
+    if (sortSelect && sortSelect.value !== 'featured') {
+        params.set('sort', sortSelect.value);
+    }
+    
+    params.set('per_page', SHOP_PAGE_SIZE);
+    return params;
+}
+
+async function fetchProductsPage(page) {
+    const params = shopQueryParams();
+    params.set('page', page);
+    const response = await fetch(`${params.has('q') ? SEARCH_API : PRODUCTS_API}?${params}`);
+    if (!response.ok) {
+        throw new Error(`Products API returned ${response.status}`);
+    }
+    return response.json();
+}
+
+async function applyFilters() {
+    if (shopApiAvailable) {
+        const request = ++shopRequest;
+        try {
+            const result = await fetchProductsPage(1);
+            // A newer filter change has been sent since this one
+            if (request !== shopRequest) return;
+            shopTotal = result.total;
+            filteredProducts = result.products;
+            displayProducts(shopTotal);
+            return;
+        } catch (error) {
+            await filterLocallyFromNowOn(error);
+            return;
+        }
+    }
+    applyFiltersLocally();
+}
+
+// The /api/shop payload carries no products, so the whole catalogue is
+// fetched before filtering in the browser
+async function filterLocallyFromNowOn(error) {
+    console.warn('Products API unavailable, filtering locally:', error);
+    shopApiAvailable = false;
+    if (currentProducts.length === 0) {
+        try {
+            currentProducts = (await fetchJSON('content.json')).products || [];
+        } catch (error) {
+            // Nothing to filter
+        }
+    }
+    applyFiltersLocally();
+}
+
+// Append the next page of cards; the ones shown so far may have been
+// pre-rendered, so they are not rebuilt
+async function loadMoreProducts() {
+    const grid = document.getElementById('productsGrid');
+    const shown = grid ? grid.querySelectorAll('.product-card').length : 0;
+    if (!grid || shown >= shopTotal) return;
+    if (!shopApiAvailable) {
+        applyFiltersLocally();
+        return;
+    }
+    
+    const request = shopRequest;
+    try {
+        const result = await fetchProductsPage(Math.floor(shown / SHOP_PAGE_SIZE) + 1);
+        if (request !== shopRequest) return;
+        shopTotal = result.total;
+        filteredProducts = filteredProducts.concat(result.products);
+        grid.insertAdjacentHTML('beforeend', result.products.map(product => createProductCard(product)).join(''));
+        updateLoadMore(shown + result.products.length, shopTotal);
+    } catch (error) {
+        await filterLocallyFromNowOn(error);
+    }
+}
+
+function applyFiltersLocally() {
     filteredProducts = [...currentProducts];
 
+    // New / bestseller links from the home page
+    const filter = new URLSearchParams(window.location.search).get('filter');
+    if (filter === 'new') {
+        filteredProducts = filteredProducts.filter(p => p.new);
+    } else if (filter === 'bestseller') {
+        filteredProducts = filteredProducts.filter(p => p.bestseller);
+    }
+
     // Category filter
     const selectedCategories = Array.from(document.querySelectorAll('#categoryFilter input:checked'))
         .map(input => input.value);
@@ -386,10 +627,41 @@ function applyFilters() {
         );
     }
 
+    // Search: every term starts a word of the name or description
+    const terms = searchWords(document.getElementById('searchInput')?.value || '');
+    if (terms.length > 0) {
+        filteredProducts = filteredProducts.filter(p => {
+            const words = searchWords(`${p.name || ''} ${p.description || ''}`);
+            return terms.every(term => words.some(word =>
+                term.length < MIN_PREFIX_LENGTH ? word === term : word.startsWith(term)));
+        });
+    }
+
+    sortProducts(document.getElementById('sortSelect')?.value);
     displayProducts();
 }
 
+// Lower-cased words, ё searched as е, as server.py search_words():
+// joined words also count whole, "C.P." is c, p and cp
+function searchWords(text) {
+    const words = [];
+    const joined = text.toLowerCase().replace(/ё/g, 'е').match(/[\p{L}\p{N}_]+(?:[.'’-][\p{L}\p{N}_]+)*/gu) || [];
+    joined.forEach(word => {
+        const parts = word.split(/[.'’-]/);
+        words.push(...parts);
+        if (parts.length > 1) {
+            words.push(parts.join(''));
+        }
+    });
+    return words;
+}
+
 function clearAllFilters() {
+    const searchInput = document.getElementById('searchInput');
+    if (searchInput) {
+        searchInput.value = '';
+    }
+    
     // Clear all checkboxes
     document.querySelectorAll('.filters-sidebar input[type="checkbox"]').forEach(input => {
         input.checked = false;
@@ -405,35 +677,31 @@ function clearAllFilters() {
         btn.classList.remove('active');
     });
     
-    filteredProducts = [...currentProducts];
-    displayProducts();
+    applyFilters();
 }
 
 function initializeSorting() {
     const sortSelect = document.getElementById('sortSelect');
     if (!sortSelect) return;
 
-    sortSelect.addEventListener('change', (e) => {
-        const sortBy = e.target.value;
-        
-        switch (sortBy) {
-            case 'price-low':
-                filteredProducts.sort((a, b) => a.price - b.price);
-                break;
-            case 'price-high':
-                filteredProducts.sort((a, b) => b.price - a.price);
-                break;
-            case 'name':
-                filteredProducts.sort((a, b) => a.name.localeCompare(b.name));
-                break;
-            default:
-                // Featured - restore original order
-                applyFilters();
-                return;
-        }
-        
-        displayProducts();
-    });
+    sortSelect.addEventListener('change', applyFilters);
+}
+
+function sortProducts(sortBy) {
+    switch (sortBy) {
+        case 'price-low':
+            filteredProducts.sort((a, b) => a.price - b.price);
+            break;
+        case 'price-high':
+            filteredProducts.sort((a, b) => b.price - a.price);
+            break;
+        case 'name':
+            filteredProducts.sort((a, b) => a.name.localeCompare(b.name));
+            break;
+        default:
+            // Featured - keep catalogue order
+            break;
+    }
 }
 
 function initializeMobileFilters() {
@@ -459,6 +727,14 @@ function initializeMobileFilters() {
 // ============================================
 
 function initializeProductPage() {
+    if (document.body.dataset.prerendered) {
+        // Details came pre-rendered by render_pages.py; only wire them up
+        updateBrandInfo(document.getElementById('productBrand').textContent);
+        initializeProductTabs();
+        initializeImageZoom();
+        return;
+    }
+    
     const urlParams = new URLSearchParams(window.location.search);
     const productId = urlParams.get('id');
     
@@ -507,6 +783,7 @@ function loadProductDetails(product) {
     // Load main image
     const mainImage = document.getElementById('mainImage');
     if (mainImage) {
+        setPlaceholder(mainImage, product.imgMeta);
         mainImage.src = product.img;
         mainImage.alt = product.name;
     }
@@ -516,7 +793,7 @@ function loadProductDetails(product) {
     if (galleryThumbs && product.gallery) {
         galleryThumbs.innerHTML = product.gallery.map((img, index) => `
             <div class="gallery-thumb ${index === 0 ? 'active' : ''}" onclick="changeMainImage('${img}', this)">
-                <img src="${img}" alt="${product.name} ${index + 1}">
+                <img src="${img}" alt="${product.name} ${index + 1}" ${imagePlaceholder((product.galleryMeta || [])[index])}>
             </div>
         `).join('');
     }
@@ -542,9 +819,26 @@ function loadProductDetails(product) {
     initializeImageZoom();
 }
 
+function setPlaceholder(img, meta) {
+    if (meta) {
+        img.setAttribute('width', meta.width);
+        img.setAttribute('height', meta.height);
+        img.style.background = `${meta.color} url(${meta.placeholder}) center / cover no-repeat`;
+    } else {
+        img.style.background = '';
+    }
+}
+
 function changeMainImage(src, thumb) {
     const mainImage = document.getElementById('mainImage');
     if (mainImage) {
+        // Carry the thumbnail's placeholder over while the full image loads
+        const thumbImage = thumb && thumb.querySelector('img[data-placeholder]');
+        if (thumbImage) {
+            mainImage.setAttribute('width', thumbImage.getAttribute('width'));
+            mainImage.setAttribute('height', thumbImage.getAttribute('height'));
+        }
+        mainImage.style.background = thumbImage ? thumbImage.style.background : '';
         mainImage.src = src;
     }
     
@@ -822,7 +1116,8 @@ function initializeLazyLoading() {
         // Observe all images
         const images = document.querySelectorAll('img');
         images.forEach(img => {
-            if (!img.complete) {
+            // Placeholder images stream in over their blur-up instead
+            if (!img.complete && !('placeholder' in img.dataset)) {
                 imageObserver.observe(img);
             }
         });
@@ -839,8 +1134,8 @@ function initializeImageOptimization() {
             if (!img.dataset.optimized) {
                 const src = img.src || img.dataset.src;
                 
-                // Skip if already optimized
-                if (src.includes('?w=')) return;
+                // Skip if already optimized or choosing from a srcset
+                if (src.includes('?w=') || img.srcset) return;
                 
                 // Add width parameter for responsive loading
                 const width = isMobile ? 400 : (isRetina ? 1200 : 800);
@@ -870,7 +1165,7 @@ function initializeImageOptimization() {
     // Add loading animation
     document.querySelectorAll('.product-card').forEach(card => {
         const img = card.querySelector('img');
-        if (img && !img.complete) {
+        if (img && !img.complete && !('placeholder' in img.dataset)) {
             card.classList.add('loading');
             img.addEventListener('load', () => {
                 card.classList.remove('loading');
@@ -1,96 +1,357 @@
 #!/usr/bin/env python3
 """Optimize images for web performance"""
 
-from PIL import Image
+from PIL import Image, features
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import base64
+import hashlib
+import io
+import json
 import os
 import glob
+import shutil
+import sys
 
-def optimize_image(filepath, max_width=1200, quality=85):
-    """Optimize a single image"""
+from hash_assets import is_hashed, logical_path
+
+# Untouched sources live in originals/, mirroring public/assets. Outputs in
+# public/assets are always re-encoded from them, never from themselves.
+ASSETS_DIR = 'public/assets'
+ORIGINALS_DIR = 'originals'
+MANIFEST_PATH = os.path.join(ORIGINALS_DIR, 'manifest.json')
+
+# Responsive derivatives: every output is also written at these widths (and
+# its own width) in each format, under public/assets/derived, and listed in
+# derivatives.json for server.py and main.js to build srcset from
+DERIVED_DIR = os.path.join(ASSETS_DIR, 'derived')
+DERIVATIVES_PATH = os.path.join(ASSETS_DIR, 'derivatives.json')
+LADDER_WIDTHS = (400, 800, 1200)
+FORMAT_EXTENSIONS = {'jpeg': '.jpg', 'webp': '.webp', 'avif': '.avif'}
+DERIVED_FORMATS = ('jpeg', 'webp') + (('avif',) if features.check('avif') else ())
+
+# Blur-up placeholders: a tiny WebP inlined as a data URI plus the dominant
+# colour, written into content.json next to img/gallery as imgMeta and
+# galleryMeta so cards paint at the right aspect ratio before the image loads
+CONTENT_PATH = 'content.json'
+PLACEHOLDER_WIDTH = 16
+PLACEHOLDER_QUALITY = 40
+
+def prepare_image(img, max_width):
+    """Flatten to RGB and downscale to max_width, keeping the aspect ratio"""
+    # Convert RGBA to RGB if needed
+    if img.mode == 'RGBA':
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[3] if len(img.split()) > 3 else None)
+        img = background
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+    
+    # Resize if too large
+    if img.width > max_width:
+        ratio = max_width / img.width
+        new_height = int(img.height * ratio)
+        img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
+    
+    return img
+
+def encode_image(img, fp, quality=85, fmt='jpeg'):
+    """Encode an RGB image as an optimized JPEG, WebP or AVIF into a path or file object"""
+    if fmt == 'webp':
+        img.save(fp, 'WEBP', quality=quality, method=6)
+    elif fmt == 'avif':
+        # AVIF holds up at much lower quality settings than JPEG
+        img.save(fp, 'AVIF', quality=max(quality - 30, 30))
+    else:
+        img.save(fp, 'JPEG', quality=quality, optimize=True)
+
+def image_settings(relpath):
+    """Resize/quality settings for an asset path relative to public/assets"""
+    name = os.path.basename(relpath)
+    if relpath.startswith('products/'):
+        # Higher quality for real photos
+        return (1000, 90) if 'real' in name else (800, 85)
+    if relpath.startswith('lookbook/'):
+        return (1400, 88) if 'real' in name else (1000, 85)
+    if name == 'hero-bg.jpg':
+        return (1920, 82)
+    return (800, 85)
+
+def file_sha256(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_manifest():
     try:
-        img = Image.open(filepath)
-        
-        # Convert RGBA to RGB if needed
-        if img.mode == 'RGBA':
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            background.paste(img, mask=img.split()[3] if len(img.split()) > 3 else None)
-            img = background
-        elif img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        # Resize if too large
-        if img.width > max_width:
-            ratio = max_width / img.width
-            new_height = int(img.height * ratio)
-            img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-        
-        # Save optimized version
-        img.save(filepath, 'JPEG', quality=quality, optimize=True)
-        
-        # Get file size
-        size = os.path.getsize(filepath) / 1024  # KB
-        return size
-    except Exception as e:
-        print(f"Error optimizing {filepath}: {e}")
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(manifest):
+    os.makedirs(ORIGINALS_DIR, exist_ok=True)
+    tmp_path = MANIFEST_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def collect_sources(manifest):
+    """Sync originals/ with public/assets and return the relative paths
+
+    A public image becomes an original when there is none yet, or when it
+    is not the output we wrote last time (e.g. generate_images.py replaced
+    it), so new and regenerated images are picked up automatically.
+    """
+    patterns = ('products/*.jpg', 'lookbook/*.jpg', 'img/category-*.jpg', 'img/hero-bg.jpg')
+    relpaths = set()
+    for pattern in patterns:
+        for root in (ASSETS_DIR, ORIGINALS_DIR):
+            for filepath in glob.glob(os.path.join(root, pattern)):
+                if is_hashed(filepath):
+                    # Published copies from hash_assets.py, not sources
+                    continue
+                relpaths.add(os.path.relpath(filepath, root))
+
+    for relpath in sorted(relpaths):
+        source = os.path.join(ORIGINALS_DIR, relpath)
+        output = os.path.join(ASSETS_DIR, relpath)
+        entry = manifest.get(relpath)
+        if os.path.exists(output) and (
+                not os.path.exists(source)
+                or entry is None
+                or not same_file_state(output, entry.get('output'))):
+            os.makedirs(os.path.dirname(source), exist_ok=True)
+            shutil.copy2(output, source)
+    return sorted(relpaths)
+
+def file_state(filepath, sha256=None):
+    stat = os.stat(filepath)
+    return {
+        'sha256': sha256 or file_sha256(filepath),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+    }
+
+def same_file_state(filepath, state):
+    """Cheap (size, mtime) check, falling back to hashing the content"""
+    if not state:
+        return False
+    stat = os.stat(filepath)
+    if stat.st_size != state['size']:
+        return False
+    if stat.st_mtime_ns == state['mtime_ns']:
+        return True
+    return file_sha256(filepath) == state['sha256']
+
+def is_up_to_date(relpath, entry, settings):
+    source = os.path.join(ORIGINALS_DIR, relpath)
+    output = os.path.join(ASSETS_DIR, relpath)
+    return (entry is not None
+            and entry.get('settings') == settings
+            and os.path.exists(output)
+            and same_file_state(source, entry.get('source'))
+            and same_file_state(output, entry.get('output'))
+            and all(os.path.exists(os.path.join(ASSETS_DIR, d['src'][len('/assets/'):]))
+                    for d in entry.get('derivatives', [])))
+
+def placeholder_data_uri(img):
+    """PLACEHOLDER_WIDTH px wide WebP of the image as a base64 data URI"""
+    height = max(1, round(img.height * PLACEHOLDER_WIDTH / img.width))
+    tiny = img.resize((PLACEHOLDER_WIDTH, height), Image.Resampling.BOX)
+    buffer = io.BytesIO()
+    tiny.save(buffer, 'WEBP', quality=PLACEHOLDER_QUALITY, method=6)
+    return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+def dominant_color(img):
+    """Hex colour of the most common cluster in a small median-cut palette"""
+    small = img.resize((64, 64), Image.Resampling.BOX)
+    quantized = small.quantize(colors=5, method=Image.Quantize.MEDIANCUT)
+    _, index = max(quantized.getcolors())
+    r, g, b = quantized.getpalette()[index * 3:index * 3 + 3]
+    return f'#{r:02x}{g:02x}{b:02x}'
+
+def save_encoded(img, output, quality, fmt='jpeg'):
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    tmp_path = output + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        encode_image(img, f, quality, fmt)
+    os.replace(tmp_path, output)
+    return os.path.getsize(output)
+
+def write_derivatives(img, relpath, settings):
+    """Write the width ladder in every derived format for one optimized image"""
+    widths = sorted({w for w in settings['widths'] if w < img.width} | {img.width})
+    stem, _ = os.path.splitext(relpath)
+    derivatives = []
+    for width in widths:
+        resized = prepare_image(img, width)
+        for fmt in settings['formats']:
+            if fmt == 'jpeg' and width == img.width:
+                # The optimized output itself is the full-width JPEG
+                src = '/assets/' + relpath
+                size = os.path.getsize(os.path.join(ASSETS_DIR, relpath))
+            else:
+                derived = f"{stem}-{width}{FORMAT_EXTENSIONS[fmt]}"
+                src = '/assets/derived/' + derived
+                size = save_encoded(resized, os.path.join(DERIVED_DIR, derived), settings['quality'], fmt)
+            derivatives.append({
+                'src': src,
+                'format': fmt,
+                'width': resized.width,
+                'height': resized.height,
+                'bytes': size,
+            })
+    return derivatives
+
+def optimize_job(relpath, settings):
+    """Re-encode one original into public/assets (runs in a worker process)"""
+    source = os.path.join(ORIGINALS_DIR, relpath)
+    output = os.path.join(ASSETS_DIR, relpath)
+    with Image.open(source) as img:
+        optimized = prepare_image(img, settings['max_width'])
+        save_encoded(optimized, output, settings['quality'])
+        derivatives = write_derivatives(optimized, relpath, settings)
+        placeholder = placeholder_data_uri(optimized)
+        color = dominant_color(optimized)
+    return relpath, {
+        'settings': settings,
+        'source': file_state(source),
+        'output': file_state(output),
+        'width': optimized.width,
+        'height': optimized.height,
+        'placeholder': placeholder,
+        'color': color,
+        'derivatives': derivatives,
+    }
+
+def save_derivatives(manifest):
+    """Publish {"/assets/...": {width, height, bytes, variants}} for the site"""
+    derivatives = {}
+    for relpath, entry in sorted(manifest.items()):
+        if 'derivatives' not in entry:
+            continue
+        derivatives['/assets/' + relpath] = {
+            'width': entry['width'],
+            'height': entry['height'],
+            'bytes': entry['output']['size'],
+            'variants': entry['derivatives'],
+        }
+    tmp_path = DERIVATIVES_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(derivatives, f, separators=(',', ':'))
+    os.replace(tmp_path, DERIVATIVES_PATH)
+
+def image_meta(manifest, src):
+    """{width, height, color, placeholder} of an /assets/... image, or None"""
+    src = src and logical_path(src)
+    entry = manifest.get(src[len('/assets/'):]) if src and src.startswith('/assets/') else None
+    if not entry or 'placeholder' not in entry:
         return None
+    return {
+        'width': entry['width'],
+        'height': entry['height'],
+        'color': entry['color'],
+        'placeholder': entry['placeholder'],
+    }
+
+def set_meta(item, key, meta):
+    if meta:
+        item[key] = meta
+    else:
+        item.pop(key, None)
+
+def save_image_meta(manifest):
+    """Write imgMeta/galleryMeta into content.json, only if they changed"""
+    try:
+        with open(CONTENT_PATH, 'r', encoding='utf-8') as f:
+            original_json = f.read()
+    except FileNotFoundError:
+        return False
+    data = json.loads(original_json)
+
+    for section in ('products', 'categories', 'lookbook'):
+        for item in data.get(section, []):
+            set_meta(item, 'imgMeta', image_meta(manifest, item.get('img')))
+            if 'gallery' in item:
+                gallery = [image_meta(manifest, src) for src in item['gallery']]
+                set_meta(item, 'galleryMeta', gallery if any(gallery) else None)
+
+    updated_json = json.dumps(data, ensure_ascii=False, indent=2)
+    if updated_json == original_json:
+        return False
+    # Rename over the old file so server.py never reads a half-written one
+    with open(CONTENT_PATH + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(updated_json)
+    os.replace(CONTENT_PATH + '.tmp', CONTENT_PATH)
+    return True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Optimize images for web performance")
+    parser.add_argument('--jobs', '-j', type=int, default=1, help="worker processes (default: 1)")
+    parser.add_argument('--force', action='store_true', help="re-encode even if nothing changed")
+    parser.add_argument('--init', action='store_true',
+                        help=f"first run: take the images in {ASSETS_DIR} as the untouched originals")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(ORIGINALS_DIR) and not args.init:
+        # e.g. a fresh clone: public/assets then holds our earlier outputs,
+        # and encoding those again would compound the quality loss
+        sys.exit(f"❌ {ORIGINALS_DIR}/ is missing, so the images in {ASSETS_DIR} may already be optimized.\n"
+                 f"   Restore {ORIGINALS_DIR}/, or run with --init if they are untouched sources.")
 
-def main():
     print("🔧 Optimizing images for web performance...")
-    
-    # Optimize product images
-    product_images = glob.glob('public/assets/products/*.jpg')
-    print(f"\n📦 Optimizing {len(product_images)} product images...")
-    
-    for filepath in product_images:
-        original_size = os.path.getsize(filepath) / 1024
-        
-        # Different settings for different images
-        if 'real' in filepath:
-            # Higher quality for real photos
-            new_size = optimize_image(filepath, max_width=1000, quality=90)
-        else:
-            # Standard quality for generated images
-            new_size = optimize_image(filepath, max_width=800, quality=85)
-        
-        if new_size:
-            print(f"  ✅ {os.path.basename(filepath)}: {original_size:.0f}KB → {new_size:.0f}KB")
-    
-    # Optimize lookbook images
-    lookbook_images = glob.glob('public/assets/lookbook/*.jpg')
-    print(f"\n📸 Optimizing {len(lookbook_images)} lookbook images...")
-    
-    for filepath in lookbook_images:
-        original_size = os.path.getsize(filepath) / 1024
-        
-        if 'real' in filepath:
-            new_size = optimize_image(filepath, max_width=1400, quality=88)
+    manifest = load_manifest()
+    relpaths = collect_sources(manifest)
+
+    pending = []
+    for relpath in relpaths:
+        max_width, quality = image_settings(relpath)
+        settings = {
+            'max_width': max_width,
+            'quality': quality,
+            'widths': list(LADDER_WIDTHS),
+            'formats': list(DERIVED_FORMATS),
+            'placeholder': [PLACEHOLDER_WIDTH, PLACEHOLDER_QUALITY],
+        }
+        if args.force or not is_up_to_date(relpath, manifest.get(relpath), settings):
+            pending.append((relpath, settings))
+
+    print(f"\n📦 {len(pending)} of {len(relpaths)} images need optimizing ({args.jobs} jobs)...")
+    print(f"   Derived formats: {', '.join(DERIVED_FORMATS)} at widths {', '.join(map(str, LADDER_WIDTHS))}")
+
+    def report(relpath, entry):
+        manifest[relpath] = entry
+        original_size = entry['source']['size'] / 1024
+        new_size = entry['output']['size'] / 1024
+        smallest = min(entry['derivatives'], key=lambda d: d['bytes'])
+        print(f"  ✅ {relpath}: {original_size:.0f}KB → {new_size:.0f}KB "
+              f"(+{len(entry['derivatives'])} derivatives, smallest {smallest['bytes'] / 1024:.0f}KB {smallest['format']})")
+
+    try:
+        if args.jobs > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+                futures = {pool.submit(optimize_job, *job): job[0] for job in pending}
+                for future in futures:
+                    try:
+                        report(*future.result())
+                    except Exception as e:
+                        print(f"Error optimizing {futures[future]}: {e}")
         else:
-            new_size = optimize_image(filepath, max_width=1000, quality=85)
-        
-        if new_size:
-            print(f"  ✅ {os.path.basename(filepath)}: {original_size:.0f}KB → {new_size:.0f}KB")
-    
-    # Optimize category images
-    category_images = glob.glob('public/assets/img/category-*.jpg')
-    print(f"\n📁 Optimizing {len(category_images)} category images...")
-    
-    for filepath in category_images:
-        original_size = os.path.getsize(filepath) / 1024
-        new_size = optimize_image(filepath, max_width=800, quality=85)
-        
-        if new_size:
-            print(f"  ✅ {os.path.basename(filepath)}: {original_size:.0f}KB → {new_size:.0f}KB")
-    
-    # Optimize hero background
-    hero_path = 'public/assets/img/hero-bg.jpg'
-    if os.path.exists(hero_path):
-        print(f"\n🏠 Optimizing hero background...")
-        original_size = os.path.getsize(hero_path) / 1024
-        new_size = optimize_image(hero_path, max_width=1920, quality=82)
-        if new_size:
-            print(f"  ✅ hero-bg.jpg: {original_size:.0f}KB → {new_size:.0f}KB")
-    
+            for job in pending:
+                try:
+                    report(*optimize_job(*job))
+                except Exception as e:
+                    print(f"Error optimizing {job[0]}: {e}")
+    finally:
+        save_manifest(manifest)
+        save_derivatives(manifest)
+        if save_image_meta(manifest):
+            print("\n📝 content.json updated with image sizes and placeholders")
+
     print("\n✨ Optimization complete!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -2,23 +2,53 @@
 (function() {
     'use strict';
     
+    // Real-user timings, batched and sent to server.py /beacon when the
+    // page is hidden (sendBeacon survives the page unloading)
+    const BEACON_URL = '/beacon';
+    const beaconQueue = [];
+    
+    function flushBeacons() {
+        if (beaconQueue.length === 0 || !navigator.sendBeacon) return;
+        const payload = JSON.stringify({ entries: beaconQueue.splice(0) });
+        navigator.sendBeacon(BEACON_URL, payload);
+    }
+    
+    document.addEventListener('visibilitychange', function() {
+        if (document.visibilityState === 'hidden') {
+            flushBeacons();
+        }
+    });
+    window.addEventListener('pagehide', flushBeacons);
+    
     // Monitor page load performance
     window.addEventListener('load', function() {
         if ('performance' in window) {
-            const perfData = window.performance.timing;
-            const pageLoadTime = perfData.loadEventEnd - perfData.navigationStart;
-            const connectTime = perfData.responseEnd - perfData.requestStart;
-            const renderTime = perfData.domComplete - perfData.domLoading;
-            
-            console.log('🚀 Performance Metrics:');
-            console.log(`  Page Load: ${pageLoadTime}ms`);
-            console.log(`  Connect: ${connectTime}ms`);
-            console.log(`  Render: ${renderTime}ms`);
-            
-            // Send to analytics if needed
-            if (pageLoadTime > 3000) {
-                console.warn('⚠️ Slow page load detected');
-            }
+            // loadEventEnd is only set once the load handlers have returned
+            setTimeout(function() {
+                const perfData = window.performance.timing;
+                const pageLoadTime = perfData.loadEventEnd - perfData.navigationStart;
+                const connectTime = perfData.responseEnd - perfData.requestStart;
+                const renderTime = perfData.domComplete - perfData.domLoading;
+                const connection = navigator.connection ? navigator.connection.effectiveType : undefined;
+                
+                console.log('🚀 Performance Metrics:');
+                console.log(`  Page Load: ${pageLoadTime}ms`);
+                console.log(`  Connect: ${connectTime}ms`);
+                console.log(`  Render: ${renderTime}ms`);
+                
+                if (pageLoadTime > 3000) {
+                    console.warn('⚠️ Slow page load detected');
+                }
+                
+                beaconQueue.push({
+                    page: window.location.pathname,
+                    connection: connection,
+                    load: pageLoadTime,
+                    connect: connectTime,
+                    render: renderTime,
+                    slow: connection === '2g' || connection === 'slow-2g'
+                });
+            }, 0);
         }
     });
     
@@ -60,20 +90,9 @@
         });
     });
     
-    // Preload critical images
-    const criticalImages = [
-        '/assets/img/hero-bg.jpg',
-        '/assets/products/si-jacket-real.jpg',
-        '/assets/products/cp-hoodie-real.jpg'
-    ];
-    
-    criticalImages.forEach(src => {
-        const link = document.createElement('link');
-        link.rel = 'preload';
-        link.as = 'image';
-        link.href = src;
-        document.head.appendChild(link);
-    });
+    // Critical images are preloaded by server.py through Link headers
+    // and 103 Early Hints, and on static hosts by the <link rel="preload">
+    // tags render_pages.py --deploy-preloads writes at deploy time
     
     // Add touch feedback for mobile
     if ('ontouchstart' in window) {
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""Pre-render shop and product pages from content.json into prerendered/
+
+Writes the markup main.js would build in the browser, so the first paint
+needs no JSON round trip:
+
+    prerendered/shop.html              shop.html, first page of cards
+    prerendered/shop/<category>.html   shop.html?cat=<category>
+    prerendered/product/<id>.html      product.html?id=<id>
+
+server.py serves these at the original URLs while they are newer than
+content.json and the page template; main.js sees data-prerendered on
+<body> and only wires up behaviour. Pages whose inputs are unchanged are
+skipped, see prerendered/manifest.json.
+
+Static hosts serve the page templates as they are, without server.py's
+Link headers, so deploys run --deploy-preloads (before hash_assets.py
+--deploy). It writes <link rel="preload"> tags for the images each page
+shows first into the <head> of the templates in the deploy checkout, and
+renders nothing.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+from html import escape
+from urllib.parse import urljoin
+
+OUTPUT_DIR = 'prerendered'
+MANIFEST_PATH = os.path.join(OUTPUT_DIR, 'manifest.json')
+DERIVATIVES_PATH = 'public/assets/derivatives.json'
+
+# Bump when the markup below changes, to re-render every page
+RENDER_VERSION = 2
+
+# Keep in step with main.js
+SHOP_PAGE_SIZE = 24
+RELATED_PRODUCTS = 4
+PRODUCT_IMAGE_SIZES = '(max-width: 768px) 50vw, 300px'
+
+SAFE_NAME = re.compile(r'^[\w-]+$')
+
+# Preloads: the background images of a page's first section (the home
+# page hero) and the shop page's first row of cards
+PRELOAD_SHOP_CARDS = 4
+PRELOAD_START = '<!-- Preloads, written by render_pages.py -->'
+PRELOAD_END = '<!-- /Preloads -->'
+PRELOAD_BLOCK = re.compile(r'[ \t]*%s.*?%s\n' % (re.escape(PRELOAD_START), re.escape(PRELOAD_END)), re.DOTALL)
+HTML_TAG = re.compile(r'<(link|script|section)\b([^>]*)>', re.IGNORECASE)
+HTML_ATTRIBUTE = re.compile(r'([\w-]+)\s*=\s*"([^"]*)"')
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+CSS_RULE = re.compile(r'([^{}]+)\{([^{}]*)\}')
+CSS_URL = re.compile(r'url\(\s*[\'"]?([^\'")]+?)[\'"]?\s*\)')
+
+
+# Markup, ported from the functions of the same name in main.js
+
+def placeholder_style(meta):
+    return f"background: {meta['color']} url({meta['placeholder']}) center / cover no-repeat"
+
+
+def image_placeholder(meta):
+    """Blur-up attributes from content.json imgMeta, as imagePlaceholder()"""
+    if not meta:
+        return ''
+    return (f'width="{meta["width"]}" height="{meta["height"]}" data-placeholder '
+            f'style="{placeholder_style(meta)}"')
+
+
+def responsive_image(src, alt, sizes, attributes, derivatives, meta=None):
+    """<picture> with AVIF/WebP/JPEG srcsets, smallest format first"""
+    entry = derivatives.get(src)
+    if not entry:
+        return f'<img src="{src}" alt="{alt}" {image_placeholder(meta)} {attributes}>'
+
+    by_format = {}
+    for variant in entry['variants']:
+        by_format.setdefault(variant['format'], []).append(variant)
+
+    def srcset(variants):
+        return ', '.join(f"{variant['src']} {variant['width']}w" for variant in variants)
+
+    formats = sorted((fmt for fmt in by_format if fmt != 'jpeg'),
+                     key=lambda fmt: sum(variant['bytes'] for variant in by_format[fmt]))
+    sources = ''.join(f'<source type="image/{fmt}" srcset="{srcset(by_format[fmt])}" sizes="{sizes}">'
+                      for fmt in formats)
+    jpeg_srcset = f' srcset="{srcset(by_format["jpeg"])}" sizes="{sizes}"' if 'jpeg' in by_format else ''
+    dimensions = image_placeholder(meta) if meta else f'width="{entry["width"]}" height="{entry["height"]}"'
+    return f'<picture>{sources}<img src="{src}"{jpeg_srcset} alt="{alt}" {dimensions} {attributes}></picture>'
+
+
+def create_product_card(product, derivatives):
+    sold = product.get('sold')
+    if product.get('priceOnRequest'):
+        price = '<span class="price-on-request">✏️ Цена по запросу</span>'
+    elif sold:
+        price = '<span class="product-price">❌ ПРОДАНО</span>'
+    else:
+        price = f'<div class="product-price">{product["price"]} {product.get("currency") or "грн"}</div>'
+    onclick = 'return false;' if sold else f"goToProduct('{product['id']}')"
+    badges = ''
+    if product.get('new') and not sold:
+        badges += '<span class="product-badge">NEW</span>'
+    if sold:
+        badges += '<span class="product-badge" style="background: red;">SOLD</span>'
+    image = responsive_image(product['img'], product['name'], PRODUCT_IMAGE_SIZES, 'loading="lazy"', derivatives,
+                             product.get('imgMeta'))
+
+    return f'''
+        <div class="product-card {'sold' if sold else ''}" onclick="{onclick}">
+            <div class="product-image">
+                {badges}
+                {image}
+            </div>
+            <div class="product-info">
+                <div class="product-brand">{product['brand']}</div>
+                <h3 class="product-name">{product['name']}</h3>
+                {price}
+            </div>
+        </div>
+    '''
+
+
+def brand_filters(brands):
+    return ''.join(f'''
+        <label class="filter-option">
+            <input type="checkbox" value="{brand}">
+            <span>{brand}</span>
+        </label>
+    ''' for brand in brands)
+
+
+def product_price(product):
+    if product.get('sold'):
+        return '<span style="color: red;">❌ ПРОДАНО/SOLD ❌</span>'
+    if product.get('priceOnRequest'):
+        return '<span style="color: var(--color-ukraine-yellow);">✏️ Цена по запросу</span>'
+    return escape(f"{product['price']} {product.get('currency') or 'грн'} 🇺🇦")
+
+
+def gallery_thumbs(product):
+    metas = product.get('galleryMeta') or []
+    return ''.join(f'''
+            <div class="gallery-thumb {'active' if index == 0 else ''}" onclick="changeMainImage('{img}', this)">
+                <img src="{img}" alt="{product['name']} {index + 1}" {image_placeholder(metas[index] if index < len(metas) else None)}>
+            </div>
+        ''' for index, img in enumerate(product.get('gallery') or ()))
+
+
+def size_options(product):
+    return ''.join(f'''
+            <button class="size-option" onclick="selectSize(this)">{size}</button>
+        ''' for size in product.get('sizes') or ())
+
+
+def related_products(products, product):
+    """Same category first, else any other products - as loadRelatedProducts()"""
+    others = [p for p in products if p['id'] != product['id']]
+    same = [p for p in others if p.get('category') == product.get('category')]
+    return (same or others)[:RELATED_PRODUCTS]
+
+
+# Editing elements of the page templates by id
+
+def find_start_tag(html, element_id):
+    match = re.search(r'<(\w+)\b[^>]*\bid="%s"[^>]*>' % re.escape(element_id), html)
+    if not match:
+        raise ValueError(f"no element with id={element_id!r}")
+    return match
+
+
+def find_element(html, element_id):
+    """(inner start, inner end) offsets of the element with this id"""
+    match = find_start_tag(html, element_id)
+    tag = match.group(1)
+    depth = 1
+    tags = re.compile(r'<(/?)%s\b[^>]*>' % tag)
+    for inner in tags.finditer(html, match.end()):
+        depth += -1 if inner.group(1) else 1
+        if depth == 0:
+            return match.end(), inner.start()
+    raise ValueError(f"element with id={element_id!r} is not closed")
+
+
+def replace_inner(html, element_id, inner):
+    start, end = find_element(html, element_id)
+    return html[:start] + inner + html[end:]
+
+
+def set_attribute(html, element_id, name, value):
+    match = find_start_tag(html, element_id)
+    start_tag = match.group(0)
+    attribute = f'{name}="{escape(str(value))}"'
+    if re.search(r'\s%s="[^"]*"' % name, start_tag):
+        start_tag = re.sub(r'(\s)%s="[^"]*"' % name, lambda m: m.group(1) + attribute, start_tag, count=1)
+    else:
+        start_tag = start_tag[:-1] + f' {attribute}>'
+    return html[:match.start()] + start_tag + html[match.end():]
+
+
+def mark_prerendered(html, key):
+    """data-prerendered on <body> tells main.js to keep the markup"""
+    return html.replace('<body>', f'<body data-prerendered="{escape(key)}">', 1)
+
+
+# Preloads, also sent by server.py as Link headers
+
+def is_local(url):
+    return bool(url) and not url.startswith(('http:', 'https:', '//', 'data:'))
+
+
+def page_resources(page, html, read_stylesheet):
+    """(stylesheets, scripts, first-section background images) a page template refers to
+
+    read_stylesheet(url) returns a stylesheet's text, or None if it can't be read.
+    """
+    styles, scripts, section = [], [], None
+    for tag, attributes in HTML_TAG.findall(html):
+        attributes = {key.lower(): value for key, value in HTML_ATTRIBUTE.findall(attributes)}
+        tag = tag.lower()
+        if tag == 'link' and attributes.get('rel') == 'stylesheet' and is_local(attributes.get('href')):
+            styles.append(urljoin(page, attributes['href']))
+        elif tag == 'script' and is_local(attributes.get('src')):
+            scripts.append(urljoin(page, attributes['src']))
+        elif tag == 'section' and section is None:
+            section = {'.' + name for name in attributes.get('class', '').split()}
+
+    images = []
+    for style in styles:
+        css = read_stylesheet(style)
+        if css is None:
+            continue
+        for selectors, declarations in CSS_RULE.findall(CSS_COMMENT.sub('', css)):
+            if section and any(selector.strip() in section for selector in selectors.split(',')):
+                for url in CSS_URL.findall(declarations):
+                    url = urljoin(style, url)
+                    if is_local(url) and url not in images:
+                        images.append(url)
+    return styles, scripts, images
+
+
+def preferred_variants(entry):
+    """(format, variants) of the source a <picture> built from a derivatives.json entry lists first"""
+    by_format = {}
+    for variant in entry['variants']:
+        by_format.setdefault(variant['format'], []).append(variant)
+    fmt = min((fmt for fmt in by_format if fmt != 'jpeg'),
+              key=lambda fmt: sum(variant['bytes'] for variant in by_format[fmt]), default='jpeg')
+    if fmt not in by_format:
+        return None
+    return fmt, by_format[fmt]
+
+
+def preload_tag(src, entry=None, sizes=None):
+    """<link rel="preload"> for an image, as image_link() in server.py"""
+    preferred = preferred_variants(entry) if entry and sizes else None
+    if preferred is None:
+        return f'<link rel="preload" as="image" href="{src}">'
+    fmt, variants = preferred
+    srcset = ', '.join(f"{variant['src']} {variant['width']}w" for variant in variants)
+    return (f'<link rel="preload" as="image" href="{variants[-1]["src"]}" type="image/{fmt}" '
+            f'imagesrcset="{srcset}" imagesizes="{sizes}">')
+
+
+def read_stylesheet(url):
+    try:
+        with open(url.lstrip('/'), 'r', encoding='utf-8') as f:
+            return f.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def template_preloads(page, html, data, derivatives):
+    """Preload tags for a template: its hero images and, on the shop page, the first row of cards"""
+    tags = [preload_tag(image) for image in page_resources(page, html, read_stylesheet)[2]]
+    if page == '/shop.html':
+        for product in data.get('products', [])[:PRELOAD_SHOP_CARDS]:
+            # Without derivatives main.js picks a ?w= URL by viewport, see CriticalResources.links()
+            if product.get('img') in derivatives:
+                tags.append(preload_tag(product['img'], derivatives.get(product['img']), PRODUCT_IMAGE_SIZES))
+    return tags
+
+
+def write_preloads(html, tags):
+    """The template with its preload block replaced by these tags"""
+    html = PRELOAD_BLOCK.sub('', html)
+    if not tags:
+        return html
+    block = ''.join(f'    {tag}\n' for tag in [PRELOAD_START] + tags + [PRELOAD_END])
+    return html.replace('</head>', block + '</head>', 1)
+
+
+# Pages
+
+def render_shop(template, data, category, derivatives):
+    products = [p for p in data.get('products', []) if category is None or p.get('category') == category]
+    cards = ''.join(create_product_card(product, derivatives) for product in products[:SHOP_PAGE_SIZE])
+
+    html = replace_inner(template, 'productsGrid', cards)
+    html = replace_inner(html, 'resultsCount', str(len(products)))
+    html = replace_inner(html, 'brandFilter', brand_filters(data.get('brands', [])))
+    if not products:
+        html = set_attribute(html, 'productsGrid', 'style', 'display: none;')
+        html = set_attribute(html, 'noResults', 'style', 'display: block;')
+    if len(products) > SHOP_PAGE_SIZE:
+        html = set_attribute(html, 'loadMore', 'style', 'display: inline-block;')
+    if category is not None:
+        start, end = find_element(html, 'categoryFilter')
+        checkbox = f'<input type="checkbox" value="{category}">'
+        html = html[:start] + html[start:end].replace(checkbox, checkbox[:-1] + ' checked>', 1) + html[end:]
+    return mark_prerendered(html, 'shop' if category is None else f'shop:{category}')
+
+
+def render_product(template, product, related, derivatives):
+    html = replace_inner(template, 'breadcrumbProduct', escape(product['name']))
+    html = replace_inner(html, 'productBrand', escape(product['brand']))
+    html = replace_inner(html, 'productTitle', escape(product['name']))
+    html = replace_inner(html, 'productPrice', product_price(product))
+    html = replace_inner(html, 'productDescription', escape(product.get('description') or ''))
+    html = set_attribute(html, 'productNew', 'style', 'display:inline-block;' if product.get('new') else 'display:none;')
+    html = set_attribute(html, 'mainImage', 'src', product['img'])
+    html = set_attribute(html, 'mainImage', 'alt', product['name'])
+    if product.get('imgMeta'):
+        meta = product['imgMeta']
+        html = set_attribute(html, 'mainImage', 'width', meta['width'])
+        html = set_attribute(html, 'mainImage', 'height', meta['height'])
+        html = set_attribute(html, 'mainImage', 'style', placeholder_style(meta))
+    if product.get('gallery'):
+        html = replace_inner(html, 'galleryThumbs', gallery_thumbs(product))
+    if product.get('sizes'):
+        html = replace_inner(html, 'sizeOptions', size_options(product))
+    html = replace_inner(html, 'relatedProducts',
+                         ''.join(create_product_card(p, derivatives) for p in related))
+    return mark_prerendered(html, product['id'])
+
+
+# Incremental builds
+
+def fingerprint(*values):
+    raw = json.dumps([RENDER_VERSION, *values], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def image_entries(products, derivatives):
+    return {p['img']: derivatives.get(p['img']) for p in products}
+
+
+def load_json(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def write_atomic(path, text):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def plan_pages(data, derivatives, templates):
+    """{output path: (fingerprint, render)} for every page to pre-render"""
+    pages = {}
+    products = data.get('products', [])
+    brands = data.get('brands', [])
+
+    categories = [None] + sorted({p.get('category') for p in products
+                                  if SAFE_NAME.match(p.get('category') or '')})
+    for category in categories:
+        listed = [p for p in products if category is None or p.get('category') == category]
+        cards = [{k: v for k, v in p.items() if k not in ('description', 'gallery', 'galleryMeta')}
+                 for p in listed[:SHOP_PAGE_SIZE]]
+        name = 'shop.html' if category is None else os.path.join('shop', f'{category}.html')
+        pages[name] = (
+            fingerprint(templates['shop'][1], brands, len(listed), cards, image_entries(listed[:SHOP_PAGE_SIZE], derivatives)),
+            lambda category=category: render_shop(templates['shop'][0], data, category, derivatives),
+        )
+
+    for product in products:
+        if not SAFE_NAME.match(product['id']):
+            print(f"  ⚠️  Skipping {product['id']!r}: not usable as a file name")
+            continue
+        related = related_products(products, product)
+        pages[os.path.join('product', product['id'] + '.html')] = (
+            fingerprint(templates['product'][1], product, related, image_entries([product] + related, derivatives)),
+            lambda product=product, related=related: render_product(templates['product'][0], product, related, derivatives),
+        )
+    return pages
+
+
+def read_template(name):
+    with open(name, 'r', encoding='utf-8') as f:
+        # Pre-rendered pages get their preloads from server.py, per category
+        text = PRELOAD_BLOCK.sub('', f.read())
+    return text, hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def update_preloads(data, derivatives):
+    """Rewrite the preload block in the <head> of every page template (deploy checkouts only)"""
+    for name in sorted(glob.glob('*.html')):
+        with open(name, 'r', encoding='utf-8') as f:
+            html = f.read()
+        updated = write_preloads(html, template_preloads('/' + name, html, data, derivatives))
+        if updated != html:
+            write_atomic(name, updated)
+            print(f"  🔗 {name}: preloads updated")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-render shop and product pages for Barboss Room")
+    parser.add_argument('--force', action='store_true',
+                        help="re-render every page even if its inputs are unchanged")
+    parser.add_argument('--deploy-preloads', action='store_true',
+                        help="only write the image preload tags into the page templates (deploy checkouts only)")
+    args = parser.parse_args(argv)
+
+    with open('content.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    derivatives = load_json(DERIVATIVES_PATH, {})
+    if args.deploy_preloads:
+        print("🔗 Writing preload tags into the page templates...")
+        update_preloads(data, derivatives)
+        return
+
+    print("🖨️  Pre-rendering pages...")
+    templates = {'shop': read_template('shop.html'), 'product': read_template('product.html')}
+    manifest = {} if args.force else load_json(MANIFEST_PATH, {})
+
+    pages = plan_pages(data, derivatives, templates)
+    rendered = 0
+    for name, (page_fingerprint, render) in pages.items():
+        path = os.path.join(OUTPUT_DIR, name)
+        if manifest.get(name) == page_fingerprint and os.path.exists(path):
+            # Unchanged, but touch it so server.py sees it as newer than content.json
+            os.utime(path)
+            continue
+        write_atomic(path, render())
+        manifest[name] = page_fingerprint
+        rendered += 1
+        print(f"  ✅ {name}")
+
+    removed = 0
+    for name in sorted(set(manifest) - set(pages)):
+        try:
+            os.remove(os.path.join(OUTPUT_DIR, name))
+        except FileNotFoundError:
+            pass
+        del manifest[name]
+        removed += 1
+        print(f"  🗑️  {name}")
+
+    write_atomic(MANIFEST_PATH, json.dumps(manifest, indent=2, sort_keys=True))
+    print(f"\n✨ Pre-rendering complete! {rendered} rendered, "
+          f"{len(pages) - rendered} unchanged, {removed} removed")
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,2115 @@
 import http.server
 import socketserver
 import os
+import io
+import re
+import sys
+import json
+import argparse
+import glob
+import bisect
+import hashlib
+import heapq
+import threading
+import time
+import mimetypes
+import queue
+import signal
+import email.utils
+from collections import OrderedDict, defaultdict
+from collections.abc import Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs, quote, unquote
+
+from compress_assets import gzip_bytes, brotli_bytes, brotli, MIN_SIZE as MIN_COMPRESS_SIZE
+from compile_catalog import CompiledCatalog
+from render_pages import (PRELOAD_SHOP_CARDS, PRODUCT_IMAGE_SIZES, page_resources,
+                          preferred_variants)
+
+try:
+    from PIL import Image
+    from optimize_images import prepare_image, encode_image
+except ImportError:
+    Image = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PORT = int(os.environ.get("BARBOSS_PORT", 8080))
+DIRECTORY = os.environ.get("BARBOSS_ROOT", "/home/user/webapp")
+
+# Defaults for --mode threaded. A connection holds a worker for as long as
+# it is open, idle keep-alive time included, so WORKERS also caps the
+# clients kept alive at once; KEEP_ALIVE_TIMEOUT lets idle ones go early.
+WORKERS = 32
+MAX_CONNECTIONS = 256
+REQUEST_TIMEOUT = 30
+KEEP_ALIVE_TIMEOUT = 2
+
+# Images live under public/assets in the repo but are referenced as /assets/...
+PUBLIC_DIRECTORY = os.path.join(DIRECTORY, "public")
+
+# On-the-fly resizing (?w= / ?q=) is limited to these values so that clients
+# can't make the server encode arbitrary sizes
+RESIZABLE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+ALLOWED_WIDTHS = (400, 800, 1200)
+ALLOWED_QUALITIES = (60, 85)
+
+# Resized variants are kept in a small in-memory LRU and a larger on-disk store
+VARIANT_CACHE_DIR = os.environ.get("BARBOSS_CACHE_DIR", os.path.join(DIRECTORY, ".cache", "variants"))
+VARIANT_MEMORY_BUDGET = 32 * 1024 * 1024
+VARIANT_DISK_BUDGET = 512 * 1024 * 1024
+
+# Prebuilt WebP/AVIF/JPEG width ladders written by optimize_images.py
+DERIVATIVES_FILE = os.path.join(PUBLIC_DIRECTORY, "assets", "derivatives.json")
+IMAGE_FORMAT_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+# Text responses are served from compress_assets.py siblings when present,
+# otherwise compressed on the fly into a small cache
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+COMPRESSION_CACHE_BUDGET = 8 * 1024 * 1024
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+# Response headers per path come from the same rules the CDN uses, so local
+# and deployed caching match. Paths without a Cache-Control rule revalidate.
+HEADER_RULES_FILE = os.path.join(BASE_DIR, "vercel.json")
+DEFAULT_CACHE_CONTROL = "no-cache"
+ETAG_CACHE_BUDGET = 1024 * 1024
+
+# Byte ranges (206) for uncompressed files, sent with sendfile() so the
+# kernel copies file pages straight to the socket. More ranges than
+# MAX_RANGES in one request are answered with the whole file.
+USE_SENDFILE = True
+MAX_RANGES = 16
+COPY_CHUNK = 64 * 1024
+RANGE_SPEC = re.compile(r'^\s*(\d*)-(\d*)\s*$')
+
+# Catalogue API (/api/products) answered from indexes over content.json.
+# The file is parsed once and re-parsed in the background when it changes,
+# or memory-mapped from content.bin when compile_catalog.py built that from
+# the current content.json.
+CONTENT_FILE = os.path.join(DIRECTORY, "content.json")
+COMPILED_CONTENT_FILE = os.path.join(DIRECTORY, "content.bin")
+CATALOG_POLL_INTERVAL = 1.0
+CARD_FIELDS = ('id', 'name', 'brand', 'category', 'price', 'currency', 'img', 'imgMeta',
+               'sizes', 'new', 'sold', 'bestseller', 'priceOnRequest')
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+SORT_ORDERS = ('featured', 'price-low', 'price-high', 'name')
+
+# Product search (/api/search?q=, with the same filters and paging): words
+# of the name and description, case-folded for Latin and Cyrillic alike and
+# matched by prefix, name matches ranked first and whole words above longer
+# words they prefix. Built per snapshot, reusing the words of products
+# whose text did not change.
+SEARCH_FIELDS = (('name', 3), ('description', 1))
+EXACT_WORD_BONUS = 0.5
+MIN_PREFIX_LENGTH = 2
+SEARCH_CACHE_ENTRIES = 256
+SEARCH_WORD = re.compile(r"\w+(?:[.'’-]\w+)*")
+SEARCH_WORD_SEPARATORS = re.compile(r"[.'’-]")
+MAX_SEARCH_TERMS = 8
+
+# Per-page slices of content.json (/api/home, /api/shop, /api/site), so a
+# page downloads only what it renders. Products on them are card fields.
+SITE_FIELDS = ('brand', 'navigation', 'social', 'about', 'delivery', 'contacts')
+HOME_NEW_ARRIVALS = 4
+RELATED_PRODUCTS = 4
+
+# Pages written by render_pages.py, served in place of the bare templates
+# while they are newer than both the template and content.json
+PRERENDER_DIRECTORY = os.path.join(DIRECTORY, "prerendered")
+PRERENDER_NAME = re.compile(r'^[\w-]+$')
+
+# Critical files kept in memory with their headers, ETag and compressed
+# forms, so requests for them touch no files (content.json already lives
+# in the catalogue snapshot). The images preloaded for the home and shop
+# pages (see CriticalResources) are held as well.
+HOT_ASSETS = ('/index.html', '/styles.css', '/main.js', '/performance.js')
+HOT_ASSET_BUDGET_MB = 16
+HOT_ASSET_POLL_INTERVAL = 1.0
+
+# Critical resources of each page, sent as Link: rel=preload headers and,
+# to browsers navigating over HTTP/1.1, ahead of the page as 103 Early
+# Hints. Stylesheets and scripts come from the page template, images from
+# the CSS backgrounds of its first section, the first row of shop cards and
+# the product's main image; the payload is the one main.js fetches
+EARLY_HINTS = True
+PAGE_PAYLOAD_URLS = {'/index.html': '/api/home', '/shop.html': '/api/shop',
+                     '/about.html': '/api/site', '/contacts.html': '/api/site'}
+
+# Request metrics served at /metrics in Prometheus text format. Latency
+# buckets are log-linear like an HDR histogram: two per doubling, ~61us-32s.
+LATENCY_BUCKETS = tuple(2.0 ** exponent * step for exponent in range(-14, 5) for step in (1, 1.5))
+SLOW_REQUEST_SECONDS = 0.5
+ACCESS_LOG_BATCH = 256
+
+# Real-user timings posted by performance.js to /beacon, aggregated in
+# memory and appended to BEACON_LOG as one JSON line per flush window
+BEACON_LOG = os.environ.get("BARBOSS_BEACON_LOG", os.path.join(DIRECTORY, ".cache", "beacons.jsonl"))
+BEACON_FLUSH_INTERVAL = 60
+BEACON_MAX_BYTES = 16 * 1024
+BEACON_MAX_ENTRIES = 50
+BEACON_PAGES = ('index', 'shop', 'product', 'about', 'contacts')
+BEACON_CONNECTIONS = ('slow-2g', '2g', '3g', '4g')
+BEACON_METRICS = ('load', 'connect', 'render')
+BEACON_MAX_MS = 120000
+# Same log-linear layout as LATENCY_BUCKETS, in milliseconds: ~16ms-65s
+BEACON_BUCKETS = tuple(2.0 ** exponent * step for exponent in range(4, 16) for step in (1, 1.5))
+
+
+def clamp_width(value):
+    """Round a requested width up to the nearest allowed width"""
+    for width in ALLOWED_WIDTHS:
+        if value <= width:
+            return width
+    return ALLOWED_WIDTHS[-1]
+
+
+def clamp_quality(value):
+    """Snap a requested quality to the closest allowed quality"""
+    return min(ALLOWED_QUALITIES, key=lambda quality: abs(quality - value))
+
+
+def parse_resize_params(query):
+    """Return the clamped (width, quality) for a query string, or None"""
+    params = parse_qs(query)
+    width = quality = None
+    try:
+        if 'w' in params:
+            width = clamp_width(int(params['w'][0]))
+    except ValueError:
+        pass
+    try:
+        if 'q' in params:
+            quality = clamp_quality(int(params['q'][0]))
+    except ValueError:
+        pass
+    if width is None and quality is None:
+        return None
+    return width or ALLOWED_WIDTHS[-1], quality or ALLOWED_QUALITIES[-1]
+
+
+def parse_accept_encoding(header):
+    """Return the content codings a client accepts (q > 0)"""
+    accepted = set()
+    rejected = set()
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        (accepted if quality > 0 else rejected).add(coding)
+    if '*' in accepted:
+        accepted |= set(ENCODING_SUFFIXES) - rejected
+    return accepted
+
+
+def route_to_regex(source):
+    """Translate a vercel.json route source (path-to-regexp) into a regex"""
+    pattern = re.sub(r':(\w+)\*', '.*', source)
+    pattern = re.sub(r':(\w+)', '[^/]+', pattern)
+    return re.compile(f"^{pattern}$")
+
+
+def load_header_rules(path):
+    """Read the "headers" section of vercel.json as [(regex, [(key, value)])]"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[Server] No header rules loaded from {path}: {e}")
+        return []
+    rules = []
+    for rule in config.get('headers', []):
+        headers = [(header['key'], header['value']) for header in rule.get('headers', [])]
+        rules.append((route_to_regex(rule['source']), headers))
+    return rules
+
+
+HEADER_RULES = load_header_rules(HEADER_RULES_FILE)
+
+
+def headers_for_path(url_path):
+    """Collect headers from every matching rule, later rules winning"""
+    headers = {}
+    for regex, rule_headers in HEADER_RULES:
+        if regex.match(url_path):
+            for key, value in rule_headers:
+                headers[key] = value
+    headers.setdefault('Cache-Control', DEFAULT_CACHE_CONTROL)
+    return headers
+
+
+def etag_matches(header, etag):
+    """Weak comparison of an If-None-Match header against our ETag"""
+    if header.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def parse_byte_ranges(header, size):
+    """Sorted, merged (first, last) ranges of a Range header
+
+    [] when no range is satisfiable (416), None when the header should be
+    ignored and the whole file sent.
+    """
+    unit, _, specs = header.partition('=')
+    if unit.strip().lower() != 'bytes':
+        return None
+    ranges = []
+    for spec in specs.split(','):
+        match = RANGE_SPEC.match(spec)
+        if not match or match.group(1) == match.group(2) == '':
+            return None
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+            if last and end < start:
+                return None
+        else:
+            start = max(size - int(last), 0)
+            end = size - 1
+        if start < size and end >= start:
+            ranges.append((start, min(end, size - 1)))
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class FileBody:
+    """An open file and the parts of the response body to send from it
+
+    Parts are bytes, sent as they are, or (offset, count) file segments,
+    which copyfile() hands to sendfile().
+    """
+
+    def __init__(self, f, parts):
+        self.file = f
+        self.parts = parts
+
+    def close(self):
+        self.file.close()
+
+
+def is_compressible(content_type):
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def resize_image(path, width, quality):
+    """Resize and re-encode an image with the optimize_images.py pipeline"""
+    with Image.open(path) as img:
+        resized = prepare_image(img, width)
+        buffer = io.BytesIO()
+        encode_image(resized, buffer, quality)
+    return buffer.getvalue()
+
+
+class LRUCache:
+    """Thread-safe LRU of byte strings bounded by their total size"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= len(previous)
+            self._entries[key] = value
+            self.current_bytes += len(value)
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+                self.evictions += 1
+
+
+class VariantCache:
+    """Two-tier cache of encoded image variants
+
+    Keys are derived from the source path, its mtime and size, and the
+    encode parameters, so regenerating or re-optimizing a source image
+    makes its old variants unreachable; they age out of the disk budget.
+    Concurrent misses for one key wait for the first request's encode.
+    """
+
+    def __init__(self, directory, memory_budget, disk_budget):
+        self.directory = directory
+        self.disk_budget = disk_budget
+        self.memory = LRUCache(memory_budget)
+        self.disk_hits = 0
+        self.disk_evictions = 0
+        self.misses = 0
+        self._disk_bytes = None
+        self._lock = threading.Lock()
+        # key -> Future of the variant being read or encoded
+        self._pending = {}
+
+    @staticmethod
+    def key(path, width, quality, fmt):
+        stat = os.stat(path)
+        raw = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{width}|{quality}|{fmt}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get_or_create(self, path, width, quality, fmt, render):
+        """Return the cached variant bytes, calling render() on a miss"""
+        key = self.key(path, width, quality, fmt)
+        body = self.memory.get(key)
+        if body is not None:
+            return body
+
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = future = Future()
+        if pending is not None:
+            return pending.result()
+
+        try:
+            body = self._load_or_render(key, render)
+            self.memory.put(key, body)
+            future.set_result(body)
+            return body
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+
+    def _load_or_render(self, key, render):
+        disk_path = self._disk_path(key)
+        try:
+            with open(disk_path, 'rb') as f:
+                body = f.read()
+            os.utime(disk_path)
+            with self._lock:
+                self.disk_hits += 1
+        except OSError:
+            body = render()
+            with self._lock:
+                self.misses += 1
+            self._store(disk_path, body)
+        return body
+
+    def _store(self, disk_path, body):
+        try:
+            os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+            tmp_path = f"{disk_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, disk_path)
+        except OSError as e:
+            print(f"[Cache] Could not write {disk_path}: {e}")
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._disk_bytes += len(body)
+            if self._disk_bytes > self.disk_budget:
+                self._prune()
+
+    def _scan(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _prune(self):
+        """Drop least recently used files until the store is at 90% of budget"""
+        entries = sorted(self._scan(), key=lambda entry: entry[2])
+        self._disk_bytes = sum(size for _, size, _ in entries)
+        target = self.disk_budget * 0.9
+        for path, size, _ in entries:
+            if self._disk_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._disk_bytes -= size
+            self.disk_evictions += 1
+
+    def stats(self):
+        return {
+            'memory_hits': self.memory.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'memory_evictions': self.memory.evictions,
+            'disk_evictions': self.disk_evictions,
+            'memory_bytes': self.memory.current_bytes,
+        }
+
+
+class DerivativeIndex:
+    """derivatives.json, reloaded whenever optimize_images.py rewrites it"""
+
+    def __init__(self, path):
+        self.path = path
+        self._mtime = None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def entries(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return {}
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    try:
+                        with open(self.path, 'r', encoding='utf-8') as f:
+                            self._entries = json.load(f)
+                    except (OSError, ValueError) as e:
+                        print(f"[Server] Could not load {self.path}: {e}")
+                        self._entries = {}
+                    self._mtime = mtime
+        return self._entries
+
+    def lookup(self, url_path, width, accept):
+        """Smallest prebuilt variant at the requested width in an accepted format"""
+        entry = self.entries().get(url_path)
+        if not entry:
+            return None
+        formats = {fmt for fmt, mime in IMAGE_FORMAT_TYPES.items()
+                   if fmt == 'jpeg' or mime in (accept or '')}
+        candidates = [v for v in entry['variants'] if v['format'] in formats]
+        if not candidates:
+            return None
+        widths = sorted({v['width'] for v in candidates})
+        target = next((w for w in widths if w >= width), widths[-1])
+        return min((v for v in candidates if v['width'] == target), key=lambda v: v['bytes'])
+
+
+derivative_index = DerivativeIndex(DERIVATIVES_FILE)
+variant_cache = VariantCache(VARIANT_CACHE_DIR, VARIANT_MEMORY_BUDGET, VARIANT_DISK_BUDGET)
+compression_cache = LRUCache(COMPRESSION_CACHE_BUDGET)
+etag_cache = LRUCache(ETAG_CACHE_BUDGET)
+
+
+def file_etag(path, stat):
+    """Strong ETag from the file's content, hashed once per (inode, mtime, size)"""
+    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    etag = etag_cache.get(key)
+    if etag is None:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b''):
+                digest.update(chunk)
+        etag = f'"{digest.hexdigest()[:20]}"'
+        etag_cache.put(key, etag)
+    return etag
+
+
+def variant_etag(etag, suffix):
+    """ETag for a derived representation (encoding, resize) of a file"""
+    return f'{etag[:-1]}-{suffix}"'
+
+
+def compress_on_the_fly(path, stat, encoding):
+    """Compress a file with no fresh sibling, reusing earlier results"""
+    key = (path, stat.st_mtime_ns, stat.st_size, encoding)
+    body = compression_cache.get(key)
+    if body is None:
+        with open(path, 'rb') as f:
+            data = f.read()
+        body = brotli_bytes(data, quality=5) if encoding == 'br' else gzip_bytes(data, level=6)
+        compression_cache.put(key, body)
+    return body
+
+
+def encoded_body(path, stat, encoding):
+    """Body from a fresh compress_assets.py sibling, or compressed now"""
+    sibling = path + ENCODING_SUFFIXES[encoding]
+    try:
+        if os.stat(sibling).st_mtime >= stat.st_mtime:
+            with open(sibling, 'rb') as f:
+                return f.read()
+    except OSError:
+        pass
+    return compress_on_the_fly(path, stat, encoding)
+
+
+class QueryError(ValueError):
+    """A client-side mistake in an API query string (answered with 400)"""
+
+
+def card(product):
+    """The subset of a product that a product card needs"""
+    return {field: product[field] for field in CARD_FIELDS if field in product}
+
+
+def parse_flag(value):
+    value = value.lower()
+    if value in ('1', 'true', 'yes'):
+        return True
+    if value in ('0', 'false', 'no'):
+        return False
+    raise QueryError(f"expected true or false, got {value!r}")
+
+
+def parse_int(params, name, default=None, minimum=None):
+    if name not in params:
+        return default
+    try:
+        value = int(params[name][-1])
+    except ValueError:
+        raise QueryError(f"{name} must be an integer")
+    if minimum is not None and value < minimum:
+        raise QueryError(f"{name} must be at least {minimum}")
+    return value
+
+
+def parse_list(params, name):
+    """Values of a repeatable, comma-separable parameter (?size=S,M&size=L)"""
+    return [item for value in params.get(name, []) for item in value.split(',') if item]
+
+
+class LazyCards(Sequence):
+    """Product cards built on first use from a sequence of products"""
+
+    def __init__(self, products):
+        self.products = products
+        self._cards = [None] * len(products)
+
+    def __len__(self):
+        return len(self._cards)
+
+    def __getitem__(self, position):
+        result = self._cards[position]
+        if result is None:
+            result = self._cards[position] = card(self.products[position])
+        return result
+
+
+def check_product(position, product):
+    """Raise ValueError for a product the indexes can't be built from"""
+    if not isinstance(product, dict) or not isinstance(product.get('id'), str):
+        raise ValueError(f"product {position} has no id")
+    price = product.get('price', 0)
+    if isinstance(price, bool) or not isinstance(price, (int, float)):
+        raise ValueError(f"product {product['id']}: price must be a number, got {price!r}")
+
+
+class CatalogIndex:
+    """Inverted indexes over the products of content.json
+
+    Products are referred to by their position in content.json, which is
+    also the "featured" order. Each filter maps a value to the set of
+    positions having it; prices are kept sorted for range lookups.
+    """
+
+    def __init__(self, products):
+        self.products = products
+        self.cards = [card(product) for product in products]
+        for position, product in enumerate(products):
+            check_product(position, product)
+        self.positions = {product['id']: position for position, product in enumerate(products)}
+        self.by_category = defaultdict(set)
+        self.by_brand = defaultdict(set)
+        self.by_size = defaultdict(set)
+        self.flags = {'new': set(), 'sold': set(), 'bestseller': set()}
+
+        for position, product in enumerate(products):
+            self.by_category[product.get('category')].add(position)
+            self.by_brand[product.get('brand')].add(position)
+            for size in product.get('sizes') or ():
+                self.by_size[size].add(position)
+            for flag, members in self.flags.items():
+                if product.get(flag):
+                    members.add(position)
+
+        self.price_order = sorted(range(len(products)), key=lambda position: products[position].get('price', 0))
+        self.sorted_prices = [products[position].get('price', 0) for position in self.price_order]
+        self.price_desc_order = sorted(range(len(products)), key=lambda position: -products[position].get('price', 0))
+        self.name_order = sorted(range(len(products)), key=lambda position: products[position].get('name', '').casefold())
+
+    @classmethod
+    def from_compiled(cls, catalog):
+        """The same indexes read from a CompiledCatalog's columns
+
+        Products and cards are only rebuilt when a response needs them.
+        """
+        index = cls.__new__(cls)
+        index.products = catalog
+        index.cards = LazyCards(catalog)
+        index.positions = catalog.ids()
+        index.by_category = defaultdict(set, catalog.postings('category'))
+        index.by_brand = defaultdict(set, catalog.postings('brand'))
+        index.by_size = defaultdict(set, catalog.postings('size'))
+        index.flags = {flag: catalog.flagged(flag) for flag in ('new', 'sold', 'bestseller')}
+        index.price_order = catalog.column('price_order')
+        index.sorted_prices = catalog.column('sorted_prices')
+        index.price_desc_order = catalog.column('price_desc_order')
+        index.name_order = catalog.column('name_order')
+        return index
+
+    @staticmethod
+    def union(index, values):
+        matched = set()
+        for value in values:
+            matched |= index.get(value, set())
+        return matched
+
+    def price_range(self, price_min, price_max):
+        low = 0 if price_min is None else bisect.bisect_left(self.sorted_prices, price_min)
+        high = len(self.sorted_prices) if price_max is None else bisect.bisect_right(self.sorted_prices, price_max)
+        return set(self.price_order[low:high])
+
+    def query(self, categories=(), brands=(), sizes=(), price_min=None, price_max=None,
+              flags=None, sort='featured', ranked=None):
+        """Positions of matching products, in the requested order
+
+        ranked, the result of a SearchIndex search, limits the matches to
+        its positions and is the order for sort='relevance'.
+        """
+        constraints = []
+        if categories:
+            constraints.append(self.union(self.by_category, categories))
+        if brands:
+            constraints.append(self.union(self.by_brand, brands))
+        if sizes:
+            constraints.append(self.union(self.by_size, sizes))
+        if price_min is not None or price_max is not None:
+            constraints.append(self.price_range(price_min, price_max))
+        for flag, wanted in (flags or {}).items():
+            members = self.flags[flag]
+            constraints.append(members if wanted else set(range(len(self.products))) - members)
+
+        if constraints:
+            constraints.sort(key=len)
+            matched = constraints[0].intersection(*constraints[1:])
+        else:
+            matched = None
+        if ranked is not None:
+            if sort == 'relevance':
+                return ranked if matched is None else [position for position in ranked if position in matched]
+            matched = set(ranked) if matched is None else matched.intersection(ranked)
+
+        if sort == 'price-low':
+            order = self.price_order
+        elif sort == 'price-high':
+            order = self.price_desc_order
+        elif sort == 'name':
+            order = self.name_order
+        else:
+            order = range(len(self.products)) if matched is None else sorted(matched)
+        if matched is None or sort == 'featured':
+            return list(order)
+        return [position for position in order if position in matched]
+
+    def related(self, position, limit):
+        """Same-category products, else the first others in catalogue order"""
+        same = sorted(self.by_category[self.cards[position].get('category')] - {position})
+        if same:
+            return same[:limit]
+        return [other for other in range(len(self.products)) if other != position][:limit]
+
+    def search_products(self, query, search=None):
+        """Answer an /api/products query string with one page of product cards
+
+        Given a SearchIndex, answer /api/search instead: q is required and
+        results default to relevance order.
+        """
+        params = parse_qs(query)
+        sorts = SORT_ORDERS if search is None else SORT_ORDERS + ('relevance',)
+        sort = params.get('sort', ['featured' if search is None else 'relevance'])[-1]
+        if sort not in sorts:
+            raise QueryError(f"sort must be one of {', '.join(sorts)}")
+        ranked = None
+        if search is not None:
+            if 'q' not in params:
+                raise QueryError("q is required")
+            ranked = search.search(params['q'][-1])
+        flags = {flag: parse_flag(params[flag][-1]) for flag in self.flags if flag in params}
+        page = parse_int(params, 'page', 1, minimum=1)
+        per_page = min(parse_int(params, 'per_page', DEFAULT_PAGE_SIZE, minimum=1), MAX_PAGE_SIZE)
+
+        positions = self.query(
+            categories=parse_list(params, 'category'),
+            brands=parse_list(params, 'brand'),
+            sizes=parse_list(params, 'size'),
+            price_min=parse_int(params, 'price_min'),
+            price_max=parse_int(params, 'price_max'),
+            flags=flags,
+            sort=sort,
+            ranked=ranked,
+        )
+        start = (page - 1) * per_page
+        return {
+            'total': len(positions),
+            'page': page,
+            'perPage': per_page,
+            'pages': (len(positions) + per_page - 1) // per_page,
+            'products': [self.cards[position] for position in positions[start:start + per_page]],
+        }
+
+
+def search_words(text):
+    """Case-folded words of a product text or query; ё searches as е
+
+    Joined words also count whole: "C.P." is c, p and cp.
+    """
+    words = []
+    for word in SEARCH_WORD.findall(text.casefold().replace('ё', 'е')):
+        parts = SEARCH_WORD_SEPARATORS.split(word)
+        words.extend(parts)
+        if len(parts) > 1:
+            words.append(''.join(parts))
+    return words
+
+
+class SearchIndex:
+    """Inverted index from the words of product names and descriptions
+
+    Each word maps to {position: weight}, the weight summing SEARCH_FIELDS
+    over the fields it occurs in. The sorted vocabulary turns a query term
+    into the range of words it prefixes.
+    """
+
+    def __init__(self, products, previous=None):
+        reusable = previous.weights if previous is not None else {}
+        self.weights = {}
+        self.postings = defaultdict(dict)
+        for position, product in enumerate(products):
+            texts = tuple(str(product.get(field) or '') for field, _ in SEARCH_FIELDS)
+            weights = self.weights.get(texts) or reusable.get(texts)
+            if weights is None:
+                weights = defaultdict(int)
+                for text, (_, weight) in zip(texts, SEARCH_FIELDS):
+                    for word in set(search_words(text)):
+                        weights[word] += weight
+            self.weights[texts] = weights
+            for word, weight in weights.items():
+                self.postings[word][position] = weight
+        self.words = sorted(self.postings)
+        # Ranked results of recent queries, for paging and popular searches
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def matches(self, term):
+        """{position: score} of products with a word starting with term (not to be modified)
+
+        Terms shorter than MIN_PREFIX_LENGTH only match that whole word.
+        """
+        if len(term) < MIN_PREFIX_LENGTH:
+            return self.postings.get(term, {})
+        start = bisect.bisect_left(self.words, term)
+        end = bisect.bisect_left(self.words, term + '\U0010ffff', start)
+        if end - start == 1:
+            # One word: a bonus would lift every match alike
+            return self.postings[self.words[start]]
+        scores = {}
+        for word in self.words[start:end]:
+            bonus = EXACT_WORD_BONUS if word == term else 0
+            for position, weight in self.postings[word].items():
+                if weight + bonus > scores.get(position, 0):
+                    scores[position] = weight + bonus
+        return scores
+
+    def search(self, query):
+        """Positions of products matching every term of the query, best first"""
+        terms = tuple(dict.fromkeys(search_words(query)))[:MAX_SEARCH_TERMS]
+        with self._cache_lock:
+            ranked = self._cache.get(terms)
+            if ranked is not None:
+                self._cache.move_to_end(terms)
+                return ranked
+        ranked = self.rank(terms)
+        with self._cache_lock:
+            self._cache[terms] = ranked
+            if len(self._cache) > SEARCH_CACHE_ENTRIES:
+                self._cache.popitem(last=False)
+        return ranked
+
+    def rank(self, terms):
+        if not terms:
+            return []
+        scores = None
+        for matched in sorted((self.matches(term) for term in terms), key=len):
+            if scores is None:
+                scores = matched
+            else:
+                scores = {position: score + matched[position] for position, score in scores.items()
+                          if position in matched}
+            if not scores:
+                return []
+        # Stable sort: equal scores stay in catalogue order
+        ranked = sorted(scores)
+        ranked.sort(key=scores.__getitem__, reverse=True)
+        return ranked
+
+
+class Document:
+    """A JSON body with its ETag and compressed forms, built once"""
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+        self._encoded = {}
+
+    @classmethod
+    def from_payload(cls, payload):
+        return cls(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    def encoded(self, encoding):
+        body = self._encoded.get(encoding)
+        if body is None:
+            body = brotli_bytes(self.body, quality=5) if encoding == 'br' else gzip_bytes(self.body, level=6)
+            self._encoded[encoding] = body
+        return body
+
+
+def site_payload(data, index):
+    return {field: data[field] for field in SITE_FIELDS if field in data}
+
+
+def home_payload(data, index):
+    """Categories, lookbook and the cards behind new arrivals and bestsellers"""
+    new_arrivals = sorted(index.flags['new'])[:HOME_NEW_ARRIVALS]
+    positions = sorted(set(new_arrivals) | index.flags['bestseller'])
+    return {
+        'categories': data.get('categories', []),
+        'lookbook': data.get('lookbook', []),
+        'products': [index.cards[position] for position in positions],
+    }
+
+
+def shop_payload(data, index):
+    """Filter options only; the grid pages through /api/products"""
+    return {
+        'categories': data.get('categories', []),
+        'brands': data.get('brands', []),
+    }
+
+
+PAGE_PAYLOADS = {'site': site_payload, 'home': home_payload, 'shop': shop_payload}
+
+
+class CatalogSnapshot:
+    """One load of content.json: raw bytes, parsed data and indexes
+
+    Never mutated after construction (apart from memoised documents), so
+    request threads can keep using a snapshot while a newer one is built.
+    """
+
+    def __init__(self, state, data, index, content=None, path=None):
+        self.state = state
+        self.data = data
+        self.index = index
+        self.compiled = isinstance(index.products, CompiledCatalog)
+        self._content = content
+        self._path = path
+        self._documents = {}
+        self._search = None
+        self._search_lock = threading.Lock()
+
+    @classmethod
+    def from_json(cls, body, state):
+        data = json.loads(body)
+        return cls(state, data, CatalogIndex(data.get('products', [])), content=Document(body))
+
+    @classmethod
+    def from_compiled(cls, catalog, state, path):
+        return cls(state, catalog.document(), CatalogIndex.from_compiled(catalog), path=path)
+
+    @property
+    def content(self):
+        """content.json as a Document, read on first use when the snapshot is compiled"""
+        if self._content is None:
+            with open(self._path, 'rb') as f:
+                self._content = Document(f.read())
+        return self._content
+
+    @property
+    def search(self):
+        """SearchIndex over the products, built on first use"""
+        if self._search is None:
+            self.build_search()
+        return self._search
+
+    def build_search(self, previous=None):
+        """Build the SearchIndex now, reusing the words of products unchanged since previous"""
+        with self._search_lock:
+            if self._search is None:
+                self._search = SearchIndex(self.index.products, previous._search if previous else None)
+
+    def page(self, name):
+        """Document for one of PAGE_PAYLOADS, or None"""
+        document = self._documents.get(name)
+        if document is None and name in PAGE_PAYLOADS:
+            document = Document.from_payload(PAGE_PAYLOADS[name](self.data, self.index))
+            self._documents[name] = document
+        return document
+
+    def product(self, product_id):
+        """Document with one full product and its related product cards, or None"""
+        key = ('product', product_id)
+        document = self._documents.get(key)
+        if document is None:
+            position = self.index.positions.get(product_id)
+            if position is None:
+                return None
+            document = Document.from_payload({
+                'product': self.index.products[position],
+                'related': [self.index.cards[p] for p in self.index.related(position, RELATED_PRODUCTS)],
+            })
+            self._documents[key] = document
+        return document
+
+
+def prerendered_page(url):
+    """Path of the pre-rendered version of a shop or product URL, or None"""
+    params = parse_qs(url.query)
+    if url.path == '/shop.html':
+        if not params:
+            name = 'shop.html'
+        elif list(params) == ['cat'] and len(params['cat']) == 1 and PRERENDER_NAME.fullmatch(params['cat'][0]):
+            name = os.path.join('shop', params['cat'][0] + '.html')
+        else:
+            return None
+    elif (url.path == '/product.html' and list(params) == ['id'] and len(params['id']) == 1
+          and PRERENDER_NAME.fullmatch(params['id'][0])):
+        name = os.path.join('product', params['id'][0] + '.html')
+    else:
+        return None
+
+    path = os.path.join(PRERENDER_DIRECTORY, name)
+    # Belt and braces: a symlink in prerendered/ mustn't lead out of it either
+    if os.path.commonpath([os.path.realpath(path), os.path.realpath(PRERENDER_DIRECTORY)]) \
+            != os.path.realpath(PRERENDER_DIRECTORY):
+        return None
+    try:
+        rendered = os.stat(path).st_mtime_ns
+        inputs = max(os.stat(os.path.join(DIRECTORY, url.path.lstrip('/'))).st_mtime_ns,
+                     os.stat(CONTENT_FILE).st_mtime_ns)
+    except OSError:
+        return None
+    return path if rendered >= inputs else None
+
+
+def file_state(path):
+    stat = os.stat(path)
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class CatalogStore:
+    """Current CatalogSnapshot of content.json, swapped in when the file changes
+
+    A watcher thread polls the file and builds the replacement off the
+    request path; requests only ever read self._snapshot. Writers replace
+    content.json by renaming a temp file over it, so a half-written file
+    is never seen - and if one is, the old snapshot stays in place.
+    compiled_path is watched too and used whenever it matches content.json.
+    """
+
+    def __init__(self, path, compiled_path=None, interval=CATALOG_POLL_INTERVAL):
+        self.path = path
+        self.compiled_path = compiled_path
+        self.interval = interval
+        self._snapshot = None
+        self._failed_state = None
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    def snapshot(self):
+        """The live snapshot, loading it now if nothing has been loaded yet"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self.load()
+                snapshot = self._snapshot
+        return snapshot
+
+    def current_state(self):
+        """State of content.json and of the compiled file (None when absent)"""
+        compiled = None
+        if self.compiled_path is not None:
+            try:
+                compiled = file_state(self.compiled_path)
+            except OSError:
+                pass
+        return file_state(self.path), compiled
+
+    def load(self):
+        state = self.current_state()
+        snapshot = self.load_compiled(state)
+        if snapshot is not None:
+            return snapshot
+        with open(self.path, 'rb') as f:
+            body = f.read()
+        return CatalogSnapshot.from_json(body, state)
+
+    def load_compiled(self, state):
+        """Snapshot mapped from compiled_path if it was built from this content.json"""
+        if state[1] is None:
+            return None
+        try:
+            catalog = CompiledCatalog(self.compiled_path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"[Server] Ignoring {self.compiled_path}: {e}")
+            return None
+        _, mtime_ns, size = state[0]
+        if not catalog.built_from(size, mtime_ns):
+            print(f"[Server] {self.compiled_path} is older than {self.path}, re-run compile_catalog.py")
+            return None
+        return CatalogSnapshot.from_compiled(catalog, state, self.path)
+
+    def refresh(self):
+        """Rebuild if content.json changed; True when a new snapshot went live"""
+        try:
+            state = self.current_state()
+        except OSError:
+            return False
+        current = self._snapshot
+        if (current is not None and current.state == state) or state == self._failed_state:
+            return False
+        try:
+            snapshot = self.load()
+            # Off the request path, before the snapshot goes live
+            snapshot.build_search(current)
+        except Exception as e:
+            # Anything wrong with the file must not end the watcher thread:
+            # the old snapshot is kept until the file changes again
+            self._failed_state = state
+            print(f"[Server] Keeping previous catalogue, could not load {self.path}: {e!r}")
+            return False
+        with self._lock:
+            self._snapshot = snapshot
+        self._failed_state = None
+        print(f"[Server] Catalogue {'reloaded' if current else 'loaded'}: {len(snapshot.index.products)} products"
+              f"{' (compiled)' if snapshot.compiled else ''}")
+        return True
+
+    def start(self):
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name='catalog-watcher', daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval)
+            self.refresh()
+
+
+catalog_store = CatalogStore(CONTENT_FILE, COMPILED_CONTENT_FILE)
+
+
+def asset_path(url_path):
+    """File behind a URL path, with /assets/ falling back to public/ like translate_path()"""
+    path = os.path.join(DIRECTORY, url_path.lstrip('/'))
+    if url_path.startswith('/assets/') and not os.path.exists(path):
+        public = os.path.join(PUBLIC_DIRECTORY, url_path.lstrip('/'))
+        if os.path.exists(public):
+            return public
+    return path
+
+
+def guess_type(path):
+    """Content-Type as MyHTTPRequestHandler.guess_type() would pick it"""
+    ext = os.path.splitext(path)[1].lower()
+    return MyHTTPRequestHandler.extensions_map.get(ext) or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def optional_state(path):
+    try:
+        return file_state(path)
+    except OSError:
+        return None
+
+
+def image_link(src, entry=None, sizes=None):
+    """Preload for an image; with its derivatives.json entry and sizes, for the <picture> srcset main.js builds
+
+    Only the format the <picture> lists first is preloaded, typed so that
+    browsers which can't decode it skip the preload as they skip the source.
+    """
+    preferred = preferred_variants(entry) if entry and sizes else None
+    if preferred is None:
+        return f'<{src}>; rel=preload; as=image'
+    fmt, variants = preferred
+    srcset = ', '.join(f"{variant['src']} {variant['width']}w" for variant in variants)
+    return (f'<{variants[-1]["src"]}>; rel=preload; as=image; type="{IMAGE_FORMAT_TYPES[fmt]}"; '
+            f'imagesrcset="{srcset}"; imagesizes="{sizes}"')
+
+
+class CriticalResources:
+    """Link: rel=preload values for each page, from its template and the catalogue
+
+    refresh(), run by the hot-asset watcher, parses a template again only
+    when it or one of its stylesheets changes, and picks up derivatives.json;
+    links() reads just that result and the catalogue snapshot, so answering
+    a request costs no file system calls.
+    """
+
+    def __init__(self):
+        # page -> ([(path, state)], (links, images) or None)
+        self._templates = {}
+        # page -> (links, images), and derivatives.json, as of the last refresh()
+        self._pages = None
+        self._derivatives = {}
+        # (index, {category: positions}) for the current catalogue
+        self._first_cards = (None, {})
+
+    def refresh(self):
+        """Re-read the page templates, their stylesheets and derivatives.json where changed"""
+        pages = {}
+        for path in glob.glob(os.path.join(DIRECTORY, '*.html')):
+            page = '/' + os.path.basename(path)
+            template = self.template(page)
+            if template is not None:
+                pages[page] = template
+        self._derivatives = derivative_index.entries()
+        self._pages = pages
+
+    def template(self, page):
+        """(stylesheet and script links, first-section background images), or None"""
+        cached = self._templates.get(page)
+        if cached and all(optional_state(path) == state for path, state in cached[0]):
+            return cached[1]
+        path = os.path.join(DIRECTORY, page.lstrip('/'))
+        states = [(path, optional_state(path))]
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                html = f.read()
+        except (OSError, UnicodeDecodeError):
+            self._templates[page] = (states, None)
+            return None
+
+        def read_stylesheet(url):
+            style_path = asset_path(url)
+            states.append((style_path, optional_state(style_path)))
+            try:
+                with open(style_path, 'r', encoding='utf-8') as f:
+                    return f.read()
+            except (OSError, UnicodeDecodeError):
+                return None
+
+        styles, scripts, images = page_resources(page, html, read_stylesheet)
+        links = ([f'<{url}>; rel=preload; as=style' for url in styles]
+                 + [f'<{url}>; rel=preload; as=script' for url in scripts])
+        self._templates[page] = (states, (links, images))
+        return links, images
+
+    def links(self, url):
+        """Link header values for a page URL, or None if it isn't a page"""
+        if self._pages is None:
+            # Only until the hot-asset watcher has started
+            self.refresh()
+        page = '/index.html' if url.path == '/' else url.path
+        template = self._pages.get(page)
+        if template is None:
+            return None
+        links, images = template
+        links = links + [image_link(image) for image in images]
+
+        params = parse_qs(url.query)
+        if page in PAGE_PAYLOAD_URLS:
+            links.append(f'<{PAGE_PAYLOAD_URLS[page]}>; rel=preload; as=fetch; crossorigin')
+        if page not in ('/shop.html', '/product.html'):
+            return links
+        try:
+            index = catalog_store.snapshot().index
+        except (OSError, ValueError):
+            return links
+
+        if page == '/shop.html' and (not params or list(params) == ['cat'] and len(params['cat']) == 1):
+            for position in self.first_cards(index, params['cat'][0] if params else None):
+                src = index.cards[position].get('img')
+                # Cards without derivatives get a ?w= URL from main.js that
+                # depends on the viewport, which no preload can match
+                if src in self._derivatives:
+                    links.append(image_link(src, self._derivatives[src], PRODUCT_IMAGE_SIZES))
+        elif page == '/product.html' and list(params) == ['id'] and len(params['id']) == 1:
+            product_id = params['id'][0]
+            # Escaped as encodeURIComponent() does in loadPagePayload()
+            api_path = '/api/products/' + quote(product_id, safe="!'()*")
+            links.append(f'<{api_path}>; rel=preload; as=fetch; crossorigin')
+            position = index.positions.get(product_id)
+            if position is not None and index.products[position].get('img'):
+                # The main image the gallery opens on
+                links.append(image_link(index.products[position]['img']))
+        return links
+
+    def first_cards(self, index, category):
+        """Positions of the first row of cards on the shop page, optionally for one category"""
+        if self._first_cards[0] is not index:
+            self._first_cards = (index, {})
+        cards = self._first_cards[1].get(category)
+        if cards is None:
+            if category is None:
+                cards = range(min(PRELOAD_SHOP_CARDS, len(index.products)))
+            else:
+                cards = heapq.nsmallest(PRELOAD_SHOP_CARDS, index.by_category.get(category, ()))
+            if category is None or category in index.by_category:
+                self._first_cards[1][category] = cards
+        return cards
+
+    def hot_images(self):
+        """Images every visit to the home and shop pages preloads
+
+        That is the template images and, for the first row of shop cards,
+        every width of the format their preload's srcset offers.
+        """
+        images = []
+        for page in ('/index.html', '/shop.html'):
+            template = self._pages.get(page)
+            if template:
+                images.extend(template[1])
+        try:
+            index = catalog_store.snapshot().index
+        except (OSError, ValueError):
+            return list(dict.fromkeys(images))
+        for position in self.first_cards(index, None):
+            src = index.cards[position].get('img')
+            preferred = preferred_variants(self._derivatives[src]) if src in self._derivatives else None
+            if preferred:
+                images.extend(variant['src'] for variant in preferred[1])
+        return list(dict.fromkeys(images))
+
+
+critical_resources = CriticalResources()
+
+
+class HotAsset:
+    """A file read into memory with everything needed to answer for it"""
+
+    def __init__(self, url_path, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.stat = os.fstat(f.fileno())
+            self.body = f.read()
+        self.state = (self.stat.st_ino, self.stat.st_mtime_ns, self.stat.st_size)
+        self.etag = f'"{hashlib.sha1(self.body).hexdigest()[:20]}"'
+        self.last_modified = email.utils.formatdate(self.stat.st_mtime, usegmt=True)
+
+        content_type = guess_type(path)
+        compressible = is_compressible(content_type) and len(self.body) >= MIN_COMPRESS_SIZE
+        self.vary = 'Accept-Encoding' if compressible else None
+        # encoding -> (body, headers); None is identity
+        self.variants = {None: (self.body, self.response_headers(content_type, None, self.body, url_path))}
+        if compressible:
+            for encoding in ENCODING_SUFFIXES:
+                if encoding == 'br' and brotli is None:
+                    continue
+                body = encoded_body(path, self.stat, encoding)
+                self.variants[encoding] = (body, self.response_headers(content_type, encoding, body, url_path))
+
+    def response_headers(self, content_type, encoding, body, url_path):
+        headers = [('Content-Type', content_type), ('Content-Length', str(len(body)))]
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        else:
+            headers.append(('Accept-Ranges', 'bytes'))
+        headers.append(('ETag', variant_etag(self.etag, encoding) if encoding else self.etag))
+        headers.append(('Last-Modified', self.last_modified))
+        headers.extend(headers_for_path(url_path).items())
+        if self.vary:
+            headers.append(('Vary', self.vary))
+        return headers
+
+    @property
+    def size(self):
+        return sum(len(body) for body, _ in self.variants.values())
+
+
+class HotAssetTable:
+    """HOT_ASSETS held in memory, re-read by a watcher thread when they change
+
+    Assets are loaded in HOT_ASSETS order, then the preloads' hot images,
+    until the memory budget is used up; the rest are served from disk as
+    usual. Each pass also refreshes the preloads.
+    """
+
+    def __init__(self, url_paths, preloads=None):
+        self.url_paths = url_paths
+        self.preloads = preloads
+        self.budget = 0
+        self._assets = {}
+        self._over_budget = {}
+
+    def get(self, url_path):
+        return self._assets.get(url_path)
+
+    def items(self):
+        return self._assets.items()
+
+    def refresh(self):
+        """Load new and changed assets, drop deleted ones; returns bytes held"""
+        extra = ()
+        if self.preloads:
+            self.preloads.refresh()
+            extra = tuple(self.preloads.hot_images())
+        assets = {}
+        used = 0
+        for url_path in dict.fromkeys(self.url_paths + extra):
+            path = asset_path(url_path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            state = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if self._over_budget.get(url_path) == state or used + stat.st_size > self.budget:
+                continue
+            current = self._assets.get(url_path)
+            if current is None or current.state != state:
+                try:
+                    current = HotAsset(url_path, path)
+                except OSError:
+                    continue
+            if used + current.size > self.budget:
+                # Don't re-read and re-compress it every poll
+                self._over_budget[url_path] = state
+                continue
+            assets[url_path] = current
+            used += current.size
+        if '/index.html' in assets:
+            assets['/'] = assets['/index.html']
+        self._assets = assets
+        return used
+
+    def start(self, budget):
+        self.budget = budget
+        used = self.refresh()
+        if budget > 0:
+            print(f"🔥 Hot assets: {len(self._assets) - ('/' in self._assets)} files, {used / 1024:.0f}KB in memory")
+        # Started even with no budget, to keep the preloads current
+        threading.Thread(target=self._watch, name='hot-asset-watcher', daemon=True).start()
+
+    def _watch(self):
+        while True:
+            time.sleep(HOT_ASSET_POLL_INTERVAL)
+            self.refresh()
+
+
+hot_assets = HotAssetTable(HOT_ASSETS, critical_resources)
+
+
+def path_class(url_path):
+    """Coarse label for a request path, to keep metric series few"""
+    if url_path.startswith('/api/'):
+        return 'api'
+    if url_path in ('/metrics', '/beacon'):
+        return url_path[1:]
+    for prefix in ('/assets/products/', '/assets/lookbook/'):
+        if url_path.startswith(prefix):
+            return prefix.strip('/')
+    if url_path.startswith('/assets/'):
+        return 'assets/other'
+    ext = os.path.splitext(url_path)[1].lower()
+    if url_path.endswith('/') or ext == '.html':
+        return 'html'
+    if ext in ('.css', '.js'):
+        return 'css/js'
+    if ext == '.json':
+        return 'json'
+    return 'other'
+
+
+class Series:
+    """Counters and latency histogram for one (path class, status)"""
+
+    __slots__ = ('buckets', 'seconds', 'count', 'bytes', 'slow')
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.seconds = 0.0
+        self.count = 0
+        self.bytes = 0
+        self.slow = 0
+
+    def add(self, other):
+        for i, value in enumerate(other.buckets):
+            self.buckets[i] += value
+        self.seconds += other.seconds
+        self.count += other.count
+        self.bytes += other.bytes
+        self.slow += other.slow
+
+
+class RequestMetrics:
+    """Per-thread request series, merged when /metrics is scraped
+
+    Each worker thread only ever writes its own shard, so recording a
+    request takes no lock; the lock guards the list of shards.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def observe(self, label, status, seconds, sent):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        series = shard.get((label, status))
+        if series is None:
+            series = shard[(label, status)] = Series()
+        series.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        series.seconds += seconds
+        series.count += 1
+        series.bytes += sent
+        if seconds >= SLOW_REQUEST_SECONDS:
+            series.slow += 1
+
+    def merged(self):
+        with self._lock:
+            shards = list(self._shards)
+        totals = defaultdict(Series)
+        for shard in shards:
+            for key, series in list(shard.items()):
+                totals[key].add(series)
+        return dict(sorted(totals.items()))
+
+
+request_metrics = RequestMetrics()
+
+
+def render_metrics():
+    """All metrics in Prometheus text exposition format"""
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+    series = request_metrics.merged()
+    labels = {key: (('class', key[0]), ('status', key[1])) for key in series}
+    metric('barboss_requests_total', 'counter', "Requests answered, by path class and status",
+           [(labels[key], s.count) for key, s in series.items()])
+    metric('barboss_response_bytes_total', 'counter', "Response body bytes sent",
+           [(labels[key], s.bytes) for key, s in series.items()])
+    metric('barboss_slow_requests_total', 'counter', f"Requests taking {SLOW_REQUEST_SECONDS}s or longer",
+           [(labels[key], s.slow) for key, s in series.items()])
+
+    lines.append("# HELP barboss_request_duration_seconds Time from request line to last byte written")
+    lines.append("# TYPE barboss_request_duration_seconds histogram")
+    for key, s in series.items():
+        label_text = f'class="{key[0]}",status="{key[1]}"'
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, s.buckets):
+            cumulative += count
+            lines.append(f'barboss_request_duration_seconds_bucket{{{label_text},le="{bound!r}"}} {cumulative}')
+        lines.append(f'barboss_request_duration_seconds_bucket{{{label_text},le="+Inf"}} {s.count}')
+        lines.append(f'barboss_request_duration_seconds_sum{{{label_text}}} {s.seconds}')
+        lines.append(f'barboss_request_duration_seconds_count{{{label_text}}} {s.count}')
+
+    caches = {'compression': compression_cache, 'etag': etag_cache, 'variants': variant_cache.memory}
+    metric('barboss_cache_hits_total', 'counter', "Cache lookups answered from memory",
+           [((('cache', name),), cache.hits) for name, cache in caches.items()]
+           + [((('cache', 'variants_disk'),), variant_cache.disk_hits)])
+    metric('barboss_cache_misses_total', 'counter', "Cache lookups that had to build the value",
+           [((('cache', name),), cache.misses) for name, cache in caches.items() if name != 'variants']
+           + [((('cache', 'variants'),), variant_cache.misses)])
+    metric('barboss_cache_evictions_total', 'counter', "Entries dropped to stay within budget",
+           [((('cache', name),), cache.evictions) for name, cache in caches.items()]
+           + [((('cache', 'variants_disk'),), variant_cache.disk_evictions)])
+    metric('barboss_cache_bytes', 'gauge', "Bytes held in memory",
+           [((('cache', name),), cache.current_bytes) for name, cache in caches.items()])
+    metric('barboss_hot_asset_bytes', 'gauge', "Bytes held by the hot asset table",
+           [((), sum(asset.size for url_path, asset in hot_assets.items() if url_path != '/'))])
+    return '\n'.join(lines) + '\n'
+
+
+class AccessLog:
+    """Access log lines queued by request threads and written in batches
+
+    A background thread does the writing, so a slow stdout (supervisord's
+    pipe to server.log) never holds up a response.
+    """
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+
+    def write(self, line):
+        if self._thread is None:
+            print(line)
+        else:
+            self._queue.put(line)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='access-log', daemon=True)
+            self._thread.start()
+
+    def _drain(self, lines):
+        try:
+            while len(lines) < ACCESS_LOG_BATCH:
+                lines.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        sys.stdout.write('\n'.join(lines) + '\n')
+        sys.stdout.flush()
+
+    def _run(self):
+        while True:
+            self._drain([self._queue.get()])
+
+    def flush(self):
+        """Write out whatever is still queued (at shutdown)"""
+        while not self._queue.empty():
+            self._drain([])
+
+
+access_log = AccessLog()
+
+
+def beacon_page(value):
+    """Page name from a pathname, limited to the site's pages"""
+    name = os.path.splitext(os.path.basename(str(value or '')))[0] or 'index'
+    return name if name in BEACON_PAGES else 'other'
+
+
+class BeaconStore:
+    """Histograms of real-user timings by page, connection type and metric
+
+    Each flush appends the current window to BEACON_LOG and starts an
+    empty one, so the file is a compact append-only time series:
+    {"from", "to", "series": [[page, connection, metric, count, sum_ms,
+    slow, [[bucket, count], ...]], ...]} with buckets as BEACON_BUCKETS
+    indexes (len(BEACON_BUCKETS) is the overflow bucket).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._window_start = time.time()
+        self._series = {}
+
+    def record(self, entries):
+        """Add one beacon's entries; returns how many were usable"""
+        accepted = 0
+        with self._lock:
+            for entry in entries[:BEACON_MAX_ENTRIES]:
+                if not isinstance(entry, dict):
+                    continue
+                page = beacon_page(entry.get('page'))
+                connection = entry.get('connection')
+                if connection not in BEACON_CONNECTIONS:
+                    connection = 'unknown'
+                recorded = False
+                for metric in BEACON_METRICS:
+                    value = entry.get(metric)
+                    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= BEACON_MAX_MS:
+                        continue
+                    series = self._series.get((page, connection, metric))
+                    if series is None:
+                        series = self._series[(page, connection, metric)] = [0, 0.0, 0, defaultdict(int)]
+                    series[0] += 1
+                    series[1] += value
+                    series[2] += bool(entry.get('slow'))
+                    series[3][bisect.bisect_left(BEACON_BUCKETS, value)] += 1
+                    recorded = True
+                accepted += recorded
+        return accepted
+
+    def flush(self):
+        with self._lock:
+            series, started = self._series, self._window_start
+            self._reset()
+        if not series:
+            return
+        record = {
+            'from': int(started),
+            'to': int(time.time()),
+            'series': [[page, connection, metric, count, round(total, 1), slow, sorted(buckets.items())]
+                       for (page, connection, metric), (count, total, slow, buckets) in sorted(series.items())],
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, separators=(',', ':')) + '\n')
+        except OSError as e:
+            print(f"[Server] Could not write {self.path}: {e}")
+
+    def start(self):
+        threading.Thread(target=self._run, name='beacon-flush', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(BEACON_FLUSH_INTERVAL)
+            self.flush()
+
+
+beacon_store = BeaconStore(BEACON_LOG)
+
+
+class PooledHTTPServer(http.server.HTTPServer):
+    """HTTP server that hands each connection to a bounded thread pool
+
+    Connections beyond max_connections (running plus queued) are refused
+    with a 503 instead of piling up behind slow clients. Each open
+    connection, idle or not, holds one of the workers, so the worker count
+    is also the number of keep-alive clients served at once.
+    """
+
+    allow_reuse_address = True
+
+    def __init__(self, server_address, handler_class, workers=WORKERS, max_connections=MAX_CONNECTIONS):
+        super().__init__(server_address, handler_class)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='barboss-worker')
+        self.connection_slots = threading.BoundedSemaphore(max_connections)
+
+    def process_request(self, request, client_address):
+        if not self.connection_slots.acquire(blocking=False):
+            self.reject_request(request)
+            return
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.connection_slots.release()
+
+    def reject_request(self, request):
+        try:
+            request.sendall(b"HTTP/1.1 503 Service Unavailable\r\n"
+                            b"Retry-After: 1\r\n"
+                            b"Content-Length: 0\r\n"
+                            b"Connection: close\r\n\r\n")
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
 
-PORT = 8080
-DIRECTORY = "/home/user/webapp"
 
 class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+    extensions_map = {
+        **http.server.SimpleHTTPRequestHandler.extensions_map,
+        '.avif': 'image/avif',
+        '.webp': 'image/webp',
+    }
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=DIRECTORY, **kwargs)
 
+    def translate_path(self, path):
+        translated = super().translate_path(path)
+        if not os.path.exists(translated) and urlsplit(path).path.startswith('/assets/'):
+            public = os.path.join(PUBLIC_DIRECTORY, os.path.relpath(translated, self.directory))
+            if os.path.exists(public):
+                return public
+        return translated
+
+    def send_head(self):
+        url = urlsplit(self.path)
+        self._preload = critical_resources.links(url)
+        if self._preload and self.early_hints_supported():
+            self.send_early_hints(self._preload)
+        asset = hot_assets.get(url.path)
+        if asset and not url.query and 'Range' not in self.headers:
+            return self.send_hot_asset(asset)
+        if url.path == '/metrics':
+            return self.send_bytes(render_metrics().encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8')
+        if url.path == '/api/products':
+            return self.send_products_api(url.query)
+        if url.path == '/api/search':
+            return self.send_products_api(url.query, search=True)
+        if url.path.startswith('/api/products/'):
+            return self.send_document(lambda snapshot: snapshot.product(unquote(url.path[len('/api/products/'):])))
+        if url.path.startswith('/api/') and url.path[len('/api/'):] in PAGE_PAYLOADS:
+            return self.send_document(lambda snapshot: snapshot.page(url.path[len('/api/'):]))
+        if url.path == '/content.json':
+            return self.send_document(lambda snapshot: snapshot.content)
+
+        prerendered = prerendered_page(url)
+        if prerendered:
+            return self.send_file(prerendered)
+
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            index = os.path.join(path, 'index.html')
+            if not url.path.endswith('/') or not os.path.isfile(index):
+                # Redirects and directory listings stay with the stdlib
+                return super().send_head()
+            path = index
+        if not os.path.isfile(path) or path.endswith('/'):
+            return super().send_head()
+
+        if url.query and url.path.lower().endswith(RESIZABLE_EXTENSIONS):
+            params = parse_resize_params(url.query)
+            if params:
+                width, quality = params
+                if quality == ALLOWED_QUALITIES[-1]:
+                    variant = derivative_index.lookup(url.path, width, self.headers.get('Accept'))
+                    if variant:
+                        return self.send_file(self.translate_path(variant['src']), vary='Accept')
+                if Image is not None:
+                    return self.send_resized_image(path, width, quality)
+        return self.send_file(path)
+
+    def send_file(self, path, vary=None):
+        content_type = self.guess_type(path)
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+
+        try:
+            stat = os.fstat(f.fileno())
+            compressible = is_compressible(content_type) and stat.st_size >= MIN_COMPRESS_SIZE
+            if compressible:
+                vary = 'Accept-Encoding'
+            encoding = self.negotiate_encoding() if compressible else None
+            etag = file_etag(path, stat)
+            if encoding:
+                etag = variant_etag(etag, encoding)
+
+            if self.not_modified(stat, etag):
+                f.close()
+                self.send_not_modified(stat, etag, vary)
+                return None
+
+            if encoding:
+                body = encoded_body(path, stat, encoding)
+                f.close()
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Encoding', encoding)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_cache_headers(stat, etag, vary)
+                self.end_headers()
+                return io.BytesIO(body)
+
+            ranges = self.requested_ranges(stat, etag)
+            if ranges == []:
+                f.close()
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{stat.st_size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return None
+            if not ranges:
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(stat.st_size))
+                parts = [(0, stat.st_size)]
+            elif len(ranges) == 1:
+                start, end = ranges[0]
+                self.send_response(206)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Range', f'bytes {start}-{end}/{stat.st_size}')
+                self.send_header('Content-Length', str(end - start + 1))
+                parts = [(start, end - start + 1)]
+            else:
+                boundary = os.urandom(12).hex()
+                parts = []
+                for start, end in ranges:
+                    parts.append((f'\r\n--{boundary}\r\n'
+                                  f'Content-Type: {content_type}\r\n'
+                                  f'Content-Range: bytes {start}-{end}/{stat.st_size}\r\n\r\n').encode('latin-1'))
+                    parts.append((start, end - start + 1))
+                parts.append(f'\r\n--{boundary}--\r\n'.encode('latin-1'))
+                self.send_response(206)
+                self.send_header('Content-Type', f'multipart/byteranges; boundary={boundary}')
+                self.send_header('Content-Length', str(sum(
+                    len(part) if isinstance(part, bytes) else part[1] for part in parts)))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_cache_headers(stat, etag, vary)
+            self.end_headers()
+            return FileBody(f, parts)
+        except:
+            f.close()
+            raise
+
+    def requested_ranges(self, stat, etag):
+        """Ranges to send as 206, [] for 416, or None for the whole file"""
+        header = self.headers.get('Range')
+        if not header or self.command != 'GET':
+            return None
+        if_range = self.headers.get('If-Range')
+        if if_range:
+            # A strong ETag must match exactly, a date must be Last-Modified
+            if_range = if_range.strip()
+            if if_range.startswith(('"', 'W/')):
+                if if_range != etag or etag.startswith('W/'):
+                    return None
+            elif if_range != self.date_time_string(stat.st_mtime):
+                return None
+        return parse_byte_ranges(header, stat.st_size)
+
+    def copyfile(self, source, outputfile):
+        if not isinstance(source, FileBody):
+            return super().copyfile(source, outputfile)
+        for part in source.parts:
+            if isinstance(part, bytes):
+                outputfile.write(part)
+            elif USE_SENDFILE:
+                # socket.sendfile() falls back to send() where os.sendfile() can't be used
+                self.connection.sendfile(source.file, *part)
+            else:
+                offset, count = part
+                source.file.seek(offset)
+                while count > 0:
+                    chunk = source.file.read(min(COPY_CHUNK, count))
+                    if not chunk:
+                        break
+                    outputfile.write(chunk)
+                    count -= len(chunk)
+
+    def send_cache_headers(self, stat, etag, vary=None):
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', self.date_time_string(stat.st_mtime))
+        self.send_path_headers()
+        if vary:
+            self.send_header('Vary', vary)
+
+    def send_path_headers(self):
+        for key, value in headers_for_path(urlsplit(self.path).path).items():
+            self.send_header(key, value)
+        if self._preload:
+            self.send_header('Link', ', '.join(self._preload))
+
+    def early_hints_supported(self):
+        """1xx responses need HTTP/1.1 on both ends; browsers only act on them for navigations"""
+        return (EARLY_HINTS and self.command == 'GET'
+                and self.protocol_version == 'HTTP/1.1' and self.request_version == 'HTTP/1.1'
+                and self.headers.get('Sec-Fetch-Mode') == 'navigate')
+
+    def send_early_hints(self, links):
+        self.send_response_only(103)
+        self.send_header('Link', ', '.join(links))
+        # Interim responses go out at once and carry no CORS headers
+        super().end_headers()
+        self.wfile.flush()
+
+    def send_not_modified(self, stat, etag, vary=None):
+        self.send_response(304)
+        self.send_cache_headers(stat, etag, vary)
+        self.end_headers()
+
+    def not_modified(self, stat, etag):
+        """Conditional GET: If-None-Match wins, else If-Modified-Since"""
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return etag_matches(if_none_match, etag)
+
+        header = self.headers.get('If-Modified-Since')
+        if not header:
+            return False
+        try:
+            since = email.utils.parsedate_to_datetime(header)
+        except (TypeError, IndexError, OverflowError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        return int(stat.st_mtime) <= since.timestamp()
+
+    def negotiate_encoding(self):
+        """Pick br or gzip for a text response, or None for identity"""
+        accepted = parse_accept_encoding(self.headers.get('Accept-Encoding'))
+        for encoding in ENCODING_SUFFIXES:
+            if encoding == 'br' and brotli is None:
+                continue
+            if encoding in accepted:
+                return encoding
+        return None
+
+    def send_resized_image(self, path, width, quality):
+        stat = os.stat(path)
+        etag = variant_etag(file_etag(path, stat), f"w{width}q{quality}")
+        if self.not_modified(stat, etag):
+            self.send_not_modified(stat, etag)
+            return None
+
+        try:
+            body = variant_cache.get_or_create(
+                path, width, quality, 'jpeg',
+                lambda: resize_image(path, width, quality))
+        except (OSError, ValueError) as e:
+            self.log_error("Resize failed for %s: %s", path, e)
+            return self.send_file(path)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_cache_headers(stat, etag)
+        self.end_headers()
+        return io.BytesIO(body)
+
+    def send_hot_asset(self, asset):
+        """Answer from memory with the headers built when the asset was loaded"""
+        encoding = self.negotiate_encoding() if asset.vary else None
+        body, headers = asset.variants[encoding]
+        etag = variant_etag(asset.etag, encoding) if encoding else asset.etag
+        if self.not_modified(asset.stat, etag):
+            self.send_not_modified(asset.stat, etag, asset.vary)
+            return None
+
+        self.send_response(200)
+        for key, value in headers:
+            self.send_header(key, value)
+        if self._preload:
+            self.send_header('Link', ', '.join(self._preload))
+        self.end_headers()
+        return io.BytesIO(body)
+
+    def send_products_api(self, query, search=False):
+        try:
+            snapshot = catalog_store.snapshot()
+            result = snapshot.index.search_products(query, snapshot.search if search else None)
+        except QueryError as e:
+            return self.send_json({'error': str(e)}, status=400)
+        except (OSError, ValueError) as e:
+            self.log_error("Catalogue unavailable: %s", e)
+            return self.send_json({'error': "catalogue unavailable"}, status=503)
+        return self.send_json(result)
+
+    def send_document(self, find):
+        """A Document from the current catalogue snapshot, or 404"""
+        try:
+            document = find(catalog_store.snapshot())
+        except (OSError, ValueError) as e:
+            self.log_error("Catalogue unavailable: %s", e)
+            return self.send_json({'error': "catalogue unavailable"}, status=503)
+        if document is None:
+            return self.send_json({'error': "not found"}, status=404)
+        return self.send_bytes(document.body, 'application/json; charset=utf-8',
+                               etag=document.etag, encode=document.encoded)
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return self.send_bytes(body, 'application/json; charset=utf-8', status=status)
+
+    def send_bytes(self, body, content_type, status=200, etag=None, encode=None):
+        """Send an in-memory body with validators and content negotiation
+
+        encode(encoding) may supply an already compressed body.
+        """
+        etag = etag or f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+        compressible = status == 200 and len(body) >= MIN_COMPRESS_SIZE
+        encoding = self.negotiate_encoding() if compressible else None
+        if encoding:
+            etag = variant_etag(etag, encoding)
+
+        if status == 200 and self.headers.get('If-None-Match') and etag_matches(self.headers['If-None-Match'], etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_path_headers()
+            self.send_header('Vary', 'Accept-Encoding')
+            self.end_headers()
+            return None
+
+        if encoding and encode:
+            body = encode(encoding)
+        elif encoding == 'br':
+            body = brotli_bytes(body, quality=5)
+        elif encoding == 'gzip':
+            body = gzip_bytes(body, level=6)
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('ETag', etag)
+        self.send_path_headers()
+        self.send_header('Vary', 'Accept-Encoding')
+        self.end_headers()
+        return io.BytesIO(body)
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/beacon':
+            self.send_error(405, "Method not allowed")
+            return
+        self.receive_beacon()
+
+    def receive_beacon(self):
+        """navigator.sendBeacon() payload: {"entries": [{page, connection, load, connect, render, slow}]}"""
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            self.send_error(411, "Length required")
+            return
+        if not 0 < length <= BEACON_MAX_BYTES:
+            self.close_connection = True
+            self.send_error(413, "Beacon too large")
+            return
+
+        try:
+            payload = json.loads(self.rfile.read(length))
+            entries = payload.get('entries') if isinstance(payload, dict) else None
+            if not isinstance(entries, list):
+                raise ValueError("entries must be a list")
+        except (ValueError, UnicodeDecodeError):
+            self.send_error(400, "Malformed beacon")
+            return
+
+        beacon_store.record(entries)
+        self.send_response(204)
+        self.end_headers()
+
     def end_headers(self):
         # Add CORS headers for development
         self.send_header('Access-Control-Allow-Origin', '*')
@@ -17,13 +2118,127 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         super().end_headers()
 
+    # Seconds to wait for a request to start, see handle()
+    keep_alive_timeout = None
+
+    def handle(self):
+        """As BaseHTTPRequestHandler.handle(), but idle connections are closed after keep_alive_timeout
+
+        A connection holds a pool worker while it waits for its next request
+        (or, pre-opened by a browser, for its first), so that wait is kept
+        short; once a request has begun, timeout applies as before.
+        """
+        self.close_connection = True
+        while self.request_started():
+            self.handle_one_request()
+            if self.close_connection:
+                break
+
+    def request_started(self):
+        """True once the next request's first byte is in, False if the client closed or idled out"""
+        if self.keep_alive_timeout is None:
+            return True
+        self.connection.settimeout(self.keep_alive_timeout)
+        try:
+            started = bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        self.connection.settimeout(self.timeout)
+        return started
+
+    def handle_one_request(self):
+        # In threaded mode handle() has already waited for the request to
+        # start, so idle keep-alive time isn't counted. Requests that fail
+        # to parse (400, 414) have no path of their own: 'invalid'.
+        self._started = time.perf_counter()
+        self._route = 'invalid'
+        self._status = None
+        self._sent = 0
+        self._preload = None
+        super().handle_one_request()
+        if self._status is not None:
+            elapsed = time.perf_counter() - self._started
+            sent = self._sent if self.command != 'HEAD' else 0
+            request_metrics.observe(self._route, self._status, elapsed, sent)
+
+    def parse_request(self):
+        if not super().parse_request():
+            return False
+        self._route = path_class(urlsplit(self.path).path)
+        return True
+
+    def send_response_only(self, code, message=None):
+        self._status = code
+        super().send_response_only(code, message)
+
+    def send_header(self, keyword, value):
+        if keyword == 'Content-Length':
+            self._sent = int(value)
+        super().send_header(keyword, value)
+
     def log_message(self, format, *args):
-        # Custom logging
-        print(f"[Server] {self.address_string()} - {format%args}")
+        # Custom logging, written out by the access log thread
+        access_log.write(f"[Server] {self.address_string()} - {format%args}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Barboss Room development server")
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--mode', choices=('single', 'threaded'), default='single',
+                        help="single: one request at a time; threaded: pooled HTTP/1.1 keep-alive")
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help="connections served concurrently in threaded mode")
+    parser.add_argument('--max-connections', type=int, default=MAX_CONNECTIONS,
+                        help="connections admitted (served plus queued) before answering 503")
+    parser.add_argument('--timeout', type=float, default=REQUEST_TIMEOUT,
+                        help="seconds a request may stall before the connection is closed")
+    parser.add_argument('--keep-alive', type=float, default=KEEP_ALIVE_TIMEOUT,
+                        help="seconds an idle connection is kept open for its next request")
+    parser.add_argument('--hot-budget', type=float, default=HOT_ASSET_BUDGET_MB,
+                        help="MB of memory for critical files served from memory (0 disables)")
+    parser.add_argument('--no-sendfile', action='store_true',
+                        help="copy file bodies through Python buffers instead of sendfile()")
+    parser.add_argument('--no-early-hints', action='store_true',
+                        help="don't send 103 Early Hints (for proxies that mishandle 1xx responses)")
+    return parser.parse_args(argv)
+
+
+def create_server(args):
+    global USE_SENDFILE, EARLY_HINTS
+    USE_SENDFILE = not args.no_sendfile
+    EARLY_HINTS = not args.no_early_hints
+    if args.mode == 'threaded':
+        MyHTTPRequestHandler.protocol_version = 'HTTP/1.1'
+        # Headers and body go out in separate writes; without TCP_NODELAY
+        # keep-alive responses stall on delayed ACKs
+        MyHTTPRequestHandler.disable_nagle_algorithm = True
+        MyHTTPRequestHandler.timeout = args.timeout
+        MyHTTPRequestHandler.keep_alive_timeout = min(args.keep_alive, args.timeout)
+        return PooledHTTPServer(("", args.port), MyHTTPRequestHandler,
+                                workers=args.workers, max_connections=args.max_connections)
+    return socketserver.TCPServer(("", args.port), MyHTTPRequestHandler)
+
+
+def stop_on_sigterm(signum, frame):
+    # supervisord stops the program with SIGTERM; shut down as on Ctrl+C
+    raise KeyboardInterrupt
+
 
 if __name__ == "__main__":
-    with socketserver.TCPServer(("", PORT), MyHTTPRequestHandler) as httpd:
-        print(f"🚀 Barboss Room Server running at http://localhost:{PORT}")
+    args = parse_args()
+    signal.signal(signal.SIGTERM, stop_on_sigterm)
+    access_log.start()
+    catalog_store.start()
+    hot_assets.start(int(args.hot_budget * 1024 * 1024))
+    beacon_store.start()
+    with create_server(args) as httpd:
+        print(f"🚀 Barboss Room Server running at http://localhost:{args.port}")
         print(f"📁 Serving directory: {DIRECTORY}")
+        if args.mode == 'threaded':
+            print(f"🧵 Threaded mode: {args.workers} workers, {args.max_connections} max connections")
         print("Press Ctrl+C to stop")
-        httpd.serve_forever()
\ No newline at end of file
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            beacon_store.flush()
+            access_log.flush()
+            sys.exit(0)
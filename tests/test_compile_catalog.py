@@ -0,0 +1,93 @@
+"""compile_catalog.py: content.bin rebuilds content.json exactly"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from compile_catalog import CompiledCatalog, compile_catalog  # noqa: E402
+
+
+def compiled(data):
+    """CompiledCatalog of data, from a temporary content.bin"""
+    with tempfile.NamedTemporaryFile(suffix='.bin', delete=False) as f:
+        f.write(compile_catalog(data, 123, 456))
+    catalog = CompiledCatalog(f.name)
+    # Windows can't delete a file that is still mapped
+    if os.name != 'nt':
+        os.remove(f.name)
+    return catalog
+
+
+def products_json(products):
+    return json.dumps(products, ensure_ascii=False, indent=2)
+
+
+class RoundTripTest(unittest.TestCase):
+
+    def assertRoundTrip(self, data):
+        catalog = compiled(data)
+        products = data.get('products', [])
+        self.assertEqual(len(catalog), len(products))
+        rebuilt = [catalog[position] for position in range(len(catalog))]
+        # Key order too: pages and ETags are built from the serialized form
+        self.assertEqual(products_json(rebuilt), products_json(products))
+        self.assertEqual(catalog.document(), {key: value for key, value in data.items() if key != 'products'})
+        return catalog
+
+    def test_content_json(self):
+        with open(os.path.join(ROOT, 'content.json'), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        catalog = self.assertRoundTrip(data)
+        positions = {product['id']: position for position, product in enumerate(data['products'])}
+        self.assertEqual(dict(catalog.ids().items()), positions)
+
+    def test_edge_cases(self):
+        self.assertRoundTrip({
+            'brands': ['Stone Island'],
+            'products': [
+                # Fields in an unusual order, and missing ones
+                {'price': 100, 'id': 'b', 'name': 'Ёлка «Ghost»'},
+                {'id': 'a', 'priceOnRequest': True, 'sold': False, 'img': 'relative.jpg'},
+                {'id': 'c', 'sizes': {'Black': ['M', 'L'], 'White': []}, 'img': '/assets/products/c.jpg',
+                 'gallery': ['/assets/products/c.jpg'], 'imgMeta': {'width': 800, 'height': 1000}},
+                {'id': 'd', 'sizes': [], 'price': -5, 'new': True, 'bestseller': False, 'extra': None},
+                {'id': 'e', 'price': 2 ** 40, 'currency': 'грн', 'category': ''},
+            ],
+        })
+
+    def test_empty_catalogue(self):
+        self.assertRoundTrip({'products': []})
+        self.assertRoundTrip({'site': {'name': 'Barboss'}})
+
+    def test_lookup_by_id(self):
+        catalog = compiled({'products': [{'id': id_} for id_ in ('m', 'b', 'z', 'a')]})
+        ids = catalog.ids()
+        self.assertEqual([ids[id_] for id_ in ('a', 'b', 'm', 'z')], [3, 1, 0, 2])
+        self.assertNotIn('c', ids)
+        self.assertEqual(list(ids), ['m', 'b', 'z', 'a'])
+
+    def test_repeated_id_means_last_product(self):
+        # As server.py's dict over content.json would
+        ids = compiled({'products': [{'id': 'a'}, {'id': 'b'}, {'id': 'a'}]}).ids()
+        self.assertEqual(ids['a'], 2)
+
+    def test_unsupported_values(self):
+        for product in ({'name': 'no id'}, {'id': 'x', 'price': 9.99}, {'id': 'x', 'price': True},
+                        {'id': 'x', 'sold': 1}, {'id': 'x', 'category': None}, {'id': 'x', 'sizes': [42]},
+                        {'id': 'x', 'price': 2 ** 63}):
+            with self.subTest(product=product), self.assertRaises(ValueError):
+                compile_catalog({'products': [product]}, 0, 0)
+
+    def test_source_state(self):
+        catalog = compiled({'products': []})
+        self.assertTrue(catalog.built_from(123, 456))
+        self.assertFalse(catalog.built_from(123, 457))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+"""prerendered_page(): only plain names under prerendered/ are served"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import server  # noqa: E402
+
+
+def write(path, text='', mtime_ns=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+class PrerenderedPageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.site = os.path.join(self.tmp.name, 'site')
+        self.prerendered = os.path.join(self.site, 'prerendered')
+        inputs, rendered = 1_000_000_000_000_000_000, 2_000_000_000_000_000_000
+        for name in ('shop.html', 'product.html', 'content.json'):
+            write(os.path.join(self.site, name), mtime_ns=inputs)
+        for name in ('shop.html', 'shop/jackets.html', 'product/cp-parka.html'):
+            write(os.path.join(self.prerendered, name), mtime_ns=rendered)
+        # Outside prerendered/, where a traversal would land
+        write(os.path.join(self.tmp.name, 'evil', 'x.html'), mtime_ns=rendered)
+        write(os.path.join(self.site, 'secret.html'), mtime_ns=rendered)
+
+        for name, value in (('DIRECTORY', self.site), ('PRERENDER_DIRECTORY', self.prerendered),
+                            ('CONTENT_FILE', os.path.join(self.site, 'content.json'))):
+            patcher = mock.patch.object(server, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def page(self, url):
+        return server.prerendered_page(urlsplit(url))
+
+    def test_serves_plain_names(self):
+        self.assertEqual(self.page('/shop.html'), os.path.join(self.prerendered, 'shop.html'))
+        self.assertEqual(self.page('/shop.html?cat=jackets'), os.path.join(self.prerendered, 'shop', 'jackets.html'))
+        self.assertEqual(self.page('/product.html?id=cp-parka'),
+                         os.path.join(self.prerendered, 'product', 'cp-parka.html'))
+
+    def test_rejects_traversal(self):
+        for url in ('/shop.html?cat=../../evil/x', '/shop.html?cat=..%2F..%2Fevil%2Fx',
+                    '/product.html?id=../../evil/x', '/product.html?id=../secret',
+                    '/shop.html?cat=/tmp/evil/x', '/shop.html?cat=..', '/product.html?id=cp-parka%0A',
+                    '/shop.html?cat=jackets%00'):
+            with self.subTest(url=url):
+                self.assertIsNone(self.page(url))
+
+    def test_rejects_symlink_out_of_prerendered(self):
+        os.symlink(os.path.join(self.tmp.name, 'evil', 'x.html'), os.path.join(self.prerendered, 'shop', 'evil.html'))
+        self.assertIsNone(self.page('/shop.html?cat=evil'))
+
+    def test_other_queries_and_paths_are_not_prerendered(self):
+        for url in ('/shop.html?cat=jackets&cat=pants', '/shop.html?cat=jackets&sort=name', '/product.html',
+                    '/index.html', '/shop.html?page=2'):
+            with self.subTest(url=url):
+                self.assertIsNone(self.page(url))
+
+    def test_stale_page_is_not_served(self):
+        write(os.path.join(self.site, 'content.json'), mtime_ns=3_000_000_000_000_000_000)
+        self.assertIsNone(self.page('/shop.html?cat=jackets'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""server.py's SearchIndex: which products a query finds, and in what order"""
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import server  # noqa: E402
+
+PRODUCTS = [
+    {'id': 'jacket', 'name': 'Stone Island nylon jacket', 'description': 'Garment dyed'},
+    {'id': 'overshirt', 'name': 'Overshirt', 'description': 'Stone Island cotton, nylon lining'},
+    {'id': 'goggle', 'name': 'C.P. Company goggle jacket', 'description': 'Nylon'},
+    {'id': 'stoneware', 'name': 'Stoneware mug', 'description': None},
+    {'id': 'tree', 'name': 'Ёлка', 'description': 'Ghost-Piece'},
+    {'id': 'vest', 'name': 'X vest', 'description': 'Xtra light, size XL'},
+    {'id': 'parka', 'name': 'Stone Island parka'},
+]
+
+
+def ids(query, products=PRODUCTS):
+    return [products[position]['id'] for position in server.SearchIndex(products).search(query)]
+
+
+class SearchWordsTest(unittest.TestCase):
+
+    def test_words(self):
+        self.assertEqual(server.search_words('Stone ISLAND  jacket, 2024!'), ['stone', 'island', 'jacket', '2024'])
+        self.assertEqual(server.search_words(''), [])
+
+    def test_joined_words_count_whole(self):
+        self.assertEqual(server.search_words('C.P. Company'), ['c', 'p', 'cp', 'company'])
+        self.assertEqual(server.search_words("Ghost-Piece d’Arcy"),
+                         ['ghost', 'piece', 'ghostpiece', 'd', 'arcy', 'darcy'])
+
+    def test_yo_searches_as_ye(self):
+        self.assertEqual(server.search_words('Ёлка'), ['елка'])
+
+
+class SearchIndexTest(unittest.TestCase):
+
+    def test_prefix(self):
+        self.assertEqual(set(ids('isl')), {'jacket', 'overshirt', 'parka'})
+        self.assertEqual(ids('goggl'), ['goggle'])
+        self.assertEqual(ids('nothing'), [])
+        self.assertEqual(ids(''), [])
+        self.assertEqual(ids('  ,. '), [])
+
+    def test_names_rank_above_descriptions(self):
+        self.assertEqual(ids('island'), ['jacket', 'parka', 'overshirt'])
+        self.assertEqual(ids('nylon'), ['jacket', 'overshirt', 'goggle'])
+
+    def test_exact_word_above_longer_words(self):
+        # stoneware only matches the prefix; the rest have the word itself
+        self.assertEqual(ids('stone'), ['jacket', 'parka', 'stoneware', 'overshirt'])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(ids('stone jacket'), ['jacket'])
+        self.assertEqual(ids('island cotton'), ['overshirt'])
+        self.assertEqual(ids('jacket nothing'), [])
+
+    def test_ties_keep_catalogue_order(self):
+        self.assertEqual(ids('jacket'), ['jacket', 'goggle'])
+        reordered = PRODUCTS[::-1]
+        self.assertEqual(ids('jacket', reordered), ['goggle', 'jacket'])
+
+    def test_joined_words(self):
+        for query in ('c.p.', 'C.P', 'cp', 'c p'):
+            with self.subTest(query=query):
+                self.assertEqual(ids(query), ['goggle'])
+        for query in ('ghost-piece', 'ghostpiece', 'ghost piece', 'piece'):
+            with self.subTest(query=query):
+                self.assertEqual(ids(query), ['tree'])
+
+    def test_yo_and_ye_find_each_other(self):
+        self.assertEqual(ids('ёлка'), ['tree'])
+        self.assertEqual(ids('ел'), ['tree'])
+
+    def test_one_character_terms_match_whole_words(self):
+        # "x" is a word of vest's name; xtra and xl don't count
+        self.assertEqual(ids('x'), ['vest'])
+        self.assertEqual(ids('c'), ['goggle'])
+        self.assertEqual(ids('s'), [])
+        self.assertEqual(ids('xl'), ['vest'])
+
+    def test_repeated_terms_count_once(self):
+        index = server.SearchIndex(PRODUCTS)
+        self.assertEqual(index.search('nylon nylon'), index.search('nylon'))
+
+    def test_rebuild_reuses_unchanged_products(self):
+        previous = server.SearchIndex(PRODUCTS)
+        changed = PRODUCTS[:1] + [dict(PRODUCTS[1], name='Nylon overshirt')] + PRODUCTS[2:]
+        index = server.SearchIndex(changed, previous)
+        # Now in overshirt's name and description
+        self.assertEqual([changed[position]['id'] for position in index.search('nylon')],
+                         ['overshirt', 'jacket', 'goggle'])
+        self.assertEqual(index.search('stone'), previous.search('stone'))
+
+
+if __name__ == '__main__':
+    unittest.main()
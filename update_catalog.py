@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""Apply bulk product updates from a CSV or JSONL file to content.json
+
+Each row patches one product by id; only the columns present are changed:
+
+    id,price,sold,sizes,img,gallery
+    si-ghost-pants-001,19999,false,33/L|34/L-XL,,
+
+JSONL rows are objects with the same keys:
+
+    {"id": "si-ghost-pants-001", "price": 19999, "sizes": {"Black": ["M", "L"]}}
+
+In CSV, empty cells are left alone, sizes and gallery are |-separated
+(or JSON), and sold is true/false. Every img and gallery path must exist
+under public/assets. Rows are streamed and applied through an id index;
+nothing is written if any row is invalid, and content.json is replaced
+atomically.
+
+--lookbook replaces the home page lookbook with the entries of a CSV
+(img,title) or JSONL file, in page order; images must exist as above.
+
+    python3 update_catalog.py supplier-prices.csv [--dry-run]
+    python3 update_catalog.py --lookbook lookbook.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+CONTENT_PATH = 'content.json'
+PUBLIC_DIR = 'public'
+PATCH_FIELDS = ('price', 'sold', 'sizes', 'img', 'gallery')
+LOOKBOOK_FIELDS = ('img', 'title')
+LIST_SEPARATOR = '|'
+
+
+class PatchError(ValueError):
+    """A row that can't be applied"""
+
+
+def parse_bool(value):
+    value = value.strip().lower()
+    if value in ('1', 'true', 'yes'):
+        return True
+    if value in ('0', 'false', 'no'):
+        return False
+    raise PatchError(f"expected true or false, got {value!r}")
+
+
+def parse_list(value):
+    value = value.strip()
+    if value.startswith(('[', '{')):
+        try:
+            return json.loads(value)
+        except ValueError as e:
+            raise PatchError(f"bad JSON {value!r}: {e}")
+    return [item.strip() for item in value.split(LIST_SEPARATOR) if item.strip()]
+
+
+def parse_price(value):
+    try:
+        return int(value.strip())
+    except ValueError:
+        raise PatchError(f"price must be an integer, got {value!r}")
+
+
+CSV_PARSERS = {'price': parse_price, 'sold': parse_bool, 'sizes': parse_list,
+               'img': str.strip, 'gallery': parse_list}
+
+
+def read_csv(f):
+    """(line, patch) for each row, empty cells left out"""
+    reader = csv.DictReader(f)
+    unknown = set(reader.fieldnames or ()) - {'id', *PATCH_FIELDS}
+    if 'id' not in (reader.fieldnames or ()) or unknown:
+        raise PatchError(f"CSV columns must be id and any of {', '.join(PATCH_FIELDS)}"
+                         + (f", not {', '.join(sorted(unknown))}" if unknown else ""))
+    for row in reader:
+        try:
+            patch = {'id': (row['id'] or '').strip()}
+            for field in PATCH_FIELDS:
+                if row.get(field):
+                    patch[field] = CSV_PARSERS[field](row[field])
+        except PatchError as e:
+            yield reader.line_num, e
+            continue
+        yield reader.line_num, patch
+
+
+def read_jsonl(f):
+    for line_number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            patch = json.loads(line)
+        except ValueError as e:
+            yield line_number, PatchError(f"bad JSON: {e}")
+            continue
+        yield line_number, patch
+
+
+def check_patch(patch):
+    """Raise PatchError unless the patch has an id and well-typed known fields"""
+    if not isinstance(patch, dict):
+        raise PatchError("a row must be an object")
+    unknown = set(patch) - {'id', *PATCH_FIELDS}
+    if unknown:
+        raise PatchError(f"unknown field(s) {', '.join(sorted(unknown))}")
+    if not isinstance(patch.get('id'), str) or not patch['id']:
+        raise PatchError("missing id")
+    if 'price' in patch and type(patch['price']) is not int:
+        raise PatchError(f"price must be an integer, got {patch['price']!r}")
+    if 'sold' in patch and not isinstance(patch['sold'], bool):
+        raise PatchError(f"sold must be true or false, got {patch['sold']!r}")
+    if 'img' in patch and not isinstance(patch['img'], str):
+        raise PatchError(f"img must be a path, got {patch['img']!r}")
+    if 'gallery' in patch and not (isinstance(patch['gallery'], list)
+                                   and all(isinstance(path, str) for path in patch['gallery'])):
+        raise PatchError(f"gallery must be a list of paths, got {patch['gallery']!r}")
+    sizes = patch.get('sizes')
+    if 'sizes' in patch and not (
+            isinstance(sizes, list) and all(isinstance(size, str) for size in sizes)
+            or isinstance(sizes, dict) and all(isinstance(values, list) for values in sizes.values())):
+        raise PatchError(f"sizes must be a list or a {{colour: [sizes]}} object, got {sizes!r}")
+
+
+class AssetChecker:
+    """Whether /assets/... paths exist under public/, each looked up once"""
+
+    def __init__(self, public_dir):
+        self.public_dir = public_dir
+        self._known = {}
+
+    def missing(self, paths):
+        missing = []
+        for path in paths:
+            exists = self._known.get(path)
+            if exists is None:
+                exists = self._known[path] = (
+                    path.startswith('/assets/')
+                    and os.path.isfile(os.path.join(self.public_dir, path.lstrip('/'))))
+            if not exists:
+                missing.append(path)
+        return missing
+
+
+def read_lookbook_csv(f):
+    """(line, entry) for each row of an img,title CSV"""
+    reader = csv.DictReader(f)
+    if sorted(reader.fieldnames or ()) != sorted(LOOKBOOK_FIELDS):
+        raise PatchError(f"lookbook CSV columns must be {', '.join(LOOKBOOK_FIELDS)}")
+    for row in reader:
+        yield reader.line_num, {field: (row[field] or '').strip() for field in LOOKBOOK_FIELDS}
+
+
+def build_lookbook(old, rows, assets):
+    """(new lookbook, errors) from (line, entry) rows
+
+    An image already in the lookbook keeps what optimize_images.py added
+    to its entry (imgMeta).
+    """
+    previous = {item.get('img'): item for item in old}
+    lookbook = []
+    errors = []
+    for line, entry in rows:
+        try:
+            if isinstance(entry, PatchError):
+                raise entry
+            if not isinstance(entry, dict) or set(entry) != set(LOOKBOOK_FIELDS) \
+                    or not all(isinstance(entry[field], str) and entry[field] for field in LOOKBOOK_FIELDS):
+                raise PatchError(f"a lookbook entry must have a non-empty {' and '.join(LOOKBOOK_FIELDS)}")
+            if assets.missing([entry['img']]):
+                raise PatchError(f"missing asset {entry['img']}")
+        except PatchError as e:
+            errors.append(f"line {line}: {e}")
+            continue
+        lookbook.append({**previous.get(entry['img'], {}), **entry})
+    return lookbook, errors
+
+
+def describe(value):
+    return json.dumps(value, ensure_ascii=False) if not isinstance(value, str) else value
+
+
+def apply_patches(products, rows, assets):
+    """Apply (line, patch) rows in order; returns ({id: [changes]}, errors, rows, rows changing nothing)"""
+    by_id = {product['id']: product for product in products}
+    changes = {}
+    errors = []
+    count = unchanged = 0
+    for line, patch in rows:
+        count += 1
+        try:
+            if isinstance(patch, PatchError):
+                raise patch
+            check_patch(patch)
+            product = by_id.get(patch['id'])
+            if product is None:
+                raise PatchError(f"no product {patch['id']!r}")
+            missing = assets.missing(([patch['img']] if 'img' in patch else []) + patch.get('gallery', []))
+            if missing:
+                raise PatchError(f"{patch['id']}: missing asset(s) {', '.join(missing)}")
+        except PatchError as e:
+            errors.append(f"line {line}: {e}")
+            continue
+
+        changed = False
+        for field in PATCH_FIELDS:
+            if field in patch and product.get(field) != patch[field]:
+                old = product.get(field)
+                product[field] = patch[field]
+                changes.setdefault(patch['id'], []).append(
+                    f"{field} {describe(old) if old is not None else '∅'} → {describe(patch[field])}")
+                changed = True
+        unchanged += not changed
+    return changes, errors, count, unchanged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('patches', nargs='?', help="a .csv or .jsonl file of product updates")
+    parser.add_argument('--lookbook', help="a .csv (img,title) or .jsonl file listing the whole lookbook")
+    parser.add_argument('--content', default=CONTENT_PATH)
+    parser.add_argument('--dry-run', action='store_true', help="report the changes without writing")
+    args = parser.parse_args(argv)
+    if not args.patches and not args.lookbook:
+        parser.error("give a file of product updates, --lookbook, or both")
+
+    with open(args.content, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    assets = AssetChecker(PUBLIC_DIR)
+    changed = False
+
+    if args.patches:
+        read = read_csv if args.patches.lower().endswith('.csv') else read_jsonl
+        # utf-8-sig: spreadsheet exports often start with a byte order mark
+        with open(args.patches, 'r', encoding='utf-8-sig', newline='') as f:
+            try:
+                changes, errors, count, unchanged = apply_patches(data.get('products', []), read(f), assets)
+            except PatchError as e:
+                sys.exit(f"❌ {args.patches}: {e}")
+
+        for product_id, product_changes in changes.items():
+            print(f"  ✏️  {product_id}: {', '.join(product_changes)}")
+        if errors:
+            for error in errors:
+                print(f"  ❌ {args.patches} {error}")
+            sys.exit(f"\n❌ {len(errors)} of {count} rows invalid, {args.content} not updated")
+        print(f"\n📦 {count} rows: {len(changes)} products changed, {unchanged} rows changed nothing")
+        changed = bool(changes)
+
+    if args.lookbook:
+        read = read_lookbook_csv if args.lookbook.lower().endswith('.csv') else read_jsonl
+        with open(args.lookbook, 'r', encoding='utf-8-sig', newline='') as f:
+            try:
+                lookbook, errors = build_lookbook(data.get('lookbook', []), read(f), assets)
+            except PatchError as e:
+                sys.exit(f"❌ {args.lookbook}: {e}")
+        if errors:
+            for error in errors:
+                print(f"  ❌ {args.lookbook} {error}")
+            sys.exit(f"\n❌ {len(errors)} lookbook entries invalid, {args.content} not updated")
+        if lookbook == data.get('lookbook'):
+            print(f"🖼️  lookbook: {len(lookbook)} entries, unchanged")
+        else:
+            old = [item.get('title') for item in data.get('lookbook', [])]
+            print(f"  ✏️  lookbook: {describe(old)} → {describe([item['title'] for item in lookbook])}")
+            data['lookbook'] = lookbook
+            changed = True
+
+    if not changed or args.dry_run:
+        return
+
+    # Rename over the old file so server.py never reads a half-written one
+    with open(args.content + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(args.content + '.tmp', args.content)
+    print(f"📝 {args.content} updated")
+
+
+if __name__ == "__main__":
+    main()